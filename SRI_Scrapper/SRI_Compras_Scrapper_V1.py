@@ -1,7 +1,11 @@
+import argparse
+import asyncio
+import json
 import time
+from datetime import date
 import os
-import shutil
 import re
+import sys
 from pathlib import Path
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -11,69 +15,478 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 
+from cdp_tracker import CDPDownloadTracker
+from download_watcher import DownloadWatcher
+from http_engine import DEFAULT_SUFFIX, HTTPDownloadEngine
+from journal import SessionJournal
+from manifest import DownloadManifest, PendingKeys
+from metrics import StageMetrics
+from name_index import DestinationIndex
+from pacing import PacingController
+from rate_limiter import TokenBucket
+from results import DownloadResult, ResultStream
+from retry_queue import RetryQueue
+from ride import render_many
+from shards import plan_shards, shard_fields, split_shard
+from sri_report import iter_report
+from sri_soap import AUTORIZACION_URL, AutorizacionClient
+from worker_pool import MAX_WORKERS, WorkerPool
+
+# Reads every row of the documents table in one WebDriver round trip
+SNAPSHOT_ROWS_SCRIPT = """
+var rows = [];
+var links = document.querySelectorAll("a[id*='tablaCompRecibidos'][id$=':lnkXml']");
+function available(link) {
+    return !!link && link.getClientRects().length > 0 && !link.disabled
+        && link.className.indexOf('ui-state-disabled') < 0;
+}
+for (var i = 0; i < links.length; i++) {
+    var parts = links[i].id.split(':');  // frmPrincipal:tablaCompRecibidos:50:lnkXml
+    var index = parseInt(parts[parts.length - 2], 10);
+    if (isNaN(index)) { continue; }
+    var row = links[i].closest('tr');
+    var cells = [];
+    if (row) {
+        for (var j = 0; j < row.cells.length; j++) { cells.push(row.cells[j].innerText); }
+    }
+    var pdf = document.getElementById(links[i].id.replace(/lnkXml$/, 'lnkPdf'));
+    rows.push({index: index, cells: cells, xml: available(links[i]), pdf: available(pdf)});
+}
+return rows;
+"""
+
+# Tags the rows currently shown (to detect when they are replaced) and returns the active page number
+MARK_PAGE_SCRIPT = """
+var rows = document.querySelectorAll("tbody[id$='tablaCompRecibidos_data'] > tr");
+for (var i = 0; i < rows.length; i++) { rows[i].setAttribute('data-sri-old-page', '1'); }
+var active = document.querySelector("[id*='tablaCompRecibidos'] .ui-paginator-page.ui-state-active");
+return active ? active.textContent.trim() : null;
+"""
+
+# PrimeFaces AJAX queue state, active page number and whether the tagged rows are gone
+PAGE_STATE_SCRIPT = """
+var pf = window.PrimeFaces;
+var busy = (pf && pf.ajax && pf.ajax.Queue && !pf.ajax.Queue.isEmpty())
+    || (window.jQuery && jQuery.active > 0) || document.readyState !== 'complete';
+var active = document.querySelector("[id*='tablaCompRecibidos'] .ui-paginator-page.ui-state-active");
+return {
+    busy: !!busy,
+    page: active ? active.textContent.trim() : null,
+    stale: !document.querySelector("[data-sri-old-page]")
+};
+"""
+
+# Picks the largest numeric option of the rows-per-page dropdown and fires its change handler
+MAX_ROWS_SCRIPT = """
+var select = document.querySelector("[id*='tablaCompRecibidos'] select.ui-paginator-rpp-options");
+if (!select) { return null; }
+var best = null;
+for (var i = 0; i < select.options.length; i++) {
+    var value = parseInt(select.options[i].value, 10);
+    if (!isNaN(value) && (best === null || value > best)) { best = value; }
+}
+if (best === null || String(best) === select.value) { return {changed: false, rows: best}; }
+select.value = String(best);
+if (window.jQuery) { jQuery(select).trigger('change'); }
+else { select.dispatchEvent(new Event('change', {bubbles: true})); }
+return {changed: true, rows: best};
+"""
+
+# Jumps to a page (1-based) through the PrimeFaces paginator widget of tablaCompRecibidos
+JUMP_TO_PAGE_SCRIPT = """
+var widgets = (window.PrimeFaces && PrimeFaces.widgets) || {};
+for (var key in widgets) {
+    var widget = widgets[key];
+    if (!widget || !widget.id || widget.id.indexOf('tablaCompRecibidos') < 0) { continue; }
+    var paginator = widget.getPaginator ? widget.getPaginator() : widget.paginator;
+    if (!paginator) { continue; }
+    var pages = paginator.cfg.pageCount;
+    if (arguments[0] > pages) { return {found: true, jumped: false, pages: pages}; }
+    if (paginator.getCurrentPage() === arguments[0] - 1) { return {found: true, jumped: false, pages: pages, current: true}; }
+    paginator.setPage(arguments[0] - 1);
+    return {found: true, jumped: true, pages: pages};
+}
+return {found: false};
+"""
+
+# Number of pages and rows of the listing, from the paginator widget
+PAGINATOR_SCRIPT = """
+var widgets = (window.PrimeFaces && PrimeFaces.widgets) || {};
+for (var key in widgets) {
+    var widget = widgets[key];
+    if (!widget || !widget.id || widget.id.indexOf('tablaCompRecibidos') < 0) { continue; }
+    var paginator = widget.getPaginator ? widget.getPaginator() : widget.paginator;
+    if (paginator) { return {pages: paginator.cfg.pageCount, rows: paginator.cfg.rowCount}; }
+}
+return null;
+"""
+
+# Search results are in when the old rows are gone and the table shows links or its empty message
+SEARCH_STATE_SCRIPT = """
+var pf = window.PrimeFaces;
+var busy = (pf && pf.ajax && pf.ajax.Queue && !pf.ajax.Queue.isEmpty())
+    || (window.jQuery && jQuery.active > 0) || document.readyState !== 'complete';
+var links = document.querySelector("a[id*='tablaCompRecibidos'][id$=':lnkXml']");
+var empty = document.querySelector("[id*='tablaCompRecibidos'] .ui-datatable-empty-message");
+return {
+    ready: !busy && !document.querySelector("[data-sri-old-page]") && !!(links || empty),
+    empty: !links && !!empty
+};
+"""
+
+# What a second browser needs to continue this one's session: storage and the search form values
+EXPORT_SESSION_SCRIPT = """
+var storage = {};
+for (var i = 0; i < sessionStorage.length; i++) {
+    var key = sessionStorage.key(i);
+    storage[key] = sessionStorage.getItem(key);
+}
+var fields = [];
+var form = document.getElementById('frmPrincipal');
+if (form) {
+    var elements = form.querySelectorAll("select, input[type='text']");
+    for (var j = 0; j < elements.length; j++) {
+        var el = elements[j];
+        if (el.id && !el.disabled && el.id.indexOf('tablaCompRecibidos') < 0) { fields.push([el.id, el.value]); }
+    }
+}
+return {url: location.href, origin: location.origin, sessionStorage: storage, fields: fields};
+"""
+
+# Sets one search form field and fires its change handler (selects may reload dependent ones)
+SET_FIELD_SCRIPT = """
+var el = document.getElementById(arguments[0]);
+if (!el) { return false; }
+el.value = arguments[1];
+if (window.jQuery) { jQuery(el).trigger('change'); }
+else { el.dispatchEvent(new Event('change', {bubbles: true})); }
+return true;
+"""
+
+# "Consultar" button of the comprobantes recibidos search form
+SEARCH_BUTTON_IDS = ("btnRecaptcha", "frmPrincipal:btnConsultar", "frmPrincipal:btnBuscar")
+
+# CDP cookie fields accepted back by Network.setCookies
+COOKIE_FIELDS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires")
+
+# Patterns used to pick fields out of the row text
+RUC_PATTERN = re.compile(r"\b\d{13}\b")
+CLAVE_ACCESO_PATTERN = re.compile(r"\b\d{49}\b")
+DATE_PATTERN = re.compile(r"\b\d{2}/\d{2}/\d{4}\b")
+
+# Tries of a "next page" click before giving up, waiting 2s, 4s... in between
+NEXT_PAGE_ATTEMPTS = 3
+
+
+class NavigationError(RuntimeError):
+    """Paging failed (slow AJAX answer, WebDriver error), which is not the end of the listing"""
+
 
 class SRIDownloader:
-    def __init__(self):
+    def __init__(self, use_cdp=True, engine="browser", concurrency=1, interactive=True,
+                 max_attempts=3, login_timeout=900, profile_dir=None, maximize_rows=True,
+                 workers=1, max_workers=MAX_WORKERS, session_id=None, date_range=None, shard_by="month",
+                 max_shard_rows=None, listing_mode=None, report_path=None, soap_url=None, xml_only=False,
+                 render_ride=False, adaptive_pacing=True, rate_limit=None, rate_burst=5):
         # Setup directories
         self.base_dir = Path.home() / "Downloads" / "sri_files"
         self.pdf_dir = self.base_dir / "pdf"
         self.xml_dir = self.base_dir / "xml"
-        self.temp_dir = Path.home() / "Downloads"  # Chrome's default download location
+        # Private staging folder for this run, on the same filesystem as the output folders
+        self.session_id = session_id or time.strftime("%Y%m%d_%H%M%S")
+        self.temp_dir = self.base_dir / ".staging" / self.session_id
 
         # Create directories
         self.pdf_dir.mkdir(parents=True, exist_ok=True)
         self.xml_dir.mkdir(parents=True, exist_ok=True)
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
+        # Names already used in the output folders, listed once so duplicate handling costs no stat
+        self.names = DestinationIndex()
+
+        # XML-only mode never clicks a PDF link, the RIDE can be rendered locally from the XML instead
+        self.xml_only = xml_only
+        self.render_ride = render_ride
+        self.required_types = ("XML",) if xml_only else ("XML", "PDF")
+        # Remembers what earlier runs downloaded, so re-runs only fetch new documents
+        self.manifest = DownloadManifest(self.base_dir / "manifest.sqlite3", required=self.required_types)
+        # Position of the current session, used by --resume after a crash
+        journal_name = "session_journal.json" if session_id is None else f"session_journal.{session_id}.json"
+        self.journal_path = self.base_dir / journal_name
+        self.journal = SessionJournal(self.journal_path, required=self.required_types)
+        self.pool_worker = False  # set by spawn_worker, a worker's journal is only scratch state
+        self.page_number = 1
 
         self.driver = None
         self.wait = None
+        self.watcher = None
+        self.tracker = None
+        self.claim_seconds = {}  # DevTools: how long each download took to start, part of its download_wait
+        self.use_cdp = use_cdp
+        self.engine = engine  # "browser" clicks the links, "http" replays their postbacks
+        self.http_engine = None
+        self.concurrency = concurrency  # >1 runs the HTTP engine as an asyncio pipeline
+        # Batch mode: no prompts, walk every page and retry incomplete pages on its own
+        self.interactive = interactive
+        # Documents missing a file after a pass, retried with backoff and swept once more at the end
+        self.max_attempts = max_attempts
+        self.retry_queue = RetryQueue(max_attempts)
+        # Pauses between clicks and rows, tightened while the portal answers quickly
+        self.adaptive_pacing = adaptive_pacing
+        self.pacing = PacingController(adaptive=adaptive_pacing)
+        self.metrics = StageMetrics()  # time spent per stage, exported at the end of the run
+        # One JSON line per document as soon as it is done, for jobs that consume the run as it goes
+        self.results = ResultStream(self.base_dir / f"results_{self.session_id}.ndjson")
+        # Portal actions per second, shared with every worker and process using the same output folder
+        self.rate_limit = rate_limit
+        self.rate_burst = rate_burst
+        self.rate_limiter = None
+        if rate_limit:
+            self.rate_limiter = TokenBucket(rate_limit, rate_burst, self.base_dir / "rate_limit.bucket")
+        self.login_timeout = login_timeout
+        self.profile_dir = profile_dir  # Chrome profile that keeps the SRI login between runs
+        self.maximize_rows = maximize_rows
+        self.workers = workers  # browsers sharing the login, this one included
+        self.max_workers = max_workers  # politeness ceiling on browsers pointed at the portal at once
+        # Optional (start, end) dates: the query is split into shards filled in automatically
+        self.date_range = date_range
+        self.shard_by = shard_by
+        self.max_shard_rows = max_shard_rows
+        # "enumerate" lists every row first and then downloads the difference, "list-only" stops after listing
+        self.listing_mode = listing_mode
+        self.report_path = report_path  # TXT from the portal's "descargar reporte" link
+        self.soap_url = soap_url  # fetch the XMLs from the autorización web service instead of the portal
 
-    def setup_driver(self):
+    def spawn_worker(self, worker_id):
+        """Create a downloader with the same settings for a pool worker"""
+        worker = type(self)(use_cdp=self.use_cdp, engine=self.engine, concurrency=self.concurrency,
+                            interactive=False, max_attempts=self.max_attempts,
+                            login_timeout=self.login_timeout, maximize_rows=self.maximize_rows,
+                            xml_only=self.xml_only, adaptive_pacing=self.adaptive_pacing,
+                            rate_limit=self.rate_limit, rate_burst=self.rate_burst,
+                            session_id=f"{self.session_id}_w{worker_id}")
+        worker.metrics = self.metrics  # one set of histograms for the whole pool
+        worker.results = self.results  # and one result stream
+        worker.names = self.names  # workers pick names in the same folders
+        worker.pool_worker = True
+        return worker
+
+    def setup_driver(self, headless=False):
         """Setup Chrome driver with download preferences"""
         chrome_options = Options()
+        if headless:
+            chrome_options.add_argument("--headless=new")
 
-        # Download preferences - downloads go to default Downloads folder first
+        # Download preferences - downloads go to this session's staging folder first
         prefs = {
+            "download.default_directory": str(self.temp_dir),
             "download.prompt_for_download": False,
             "download.directory_upgrade": True,
             "safebrowsing.enabled": True,
             "safebrowsing.disable_download_protection": True,
-            "plugins.always_open_pdf_externally": True
+            "plugins.always_open_pdf_externally": True,
+            # Pre-grant "download multiple files" so the permission prompt never shows up
+            "profile.default_content_setting_values.automatic_downloads": 1,
         }
         chrome_options.add_experimental_option("prefs", prefs)
         chrome_options.add_argument("--safebrowsing-disable-download-protection")
+        if self.profile_dir:
+            chrome_options.add_argument(f"--user-data-dir={self.profile_dir}")
 
         try:
             service = Service()  # Uses system PATH for chromedriver
             self.driver = webdriver.Chrome(service=service, options=chrome_options)
             self.wait = WebDriverWait(self.driver, 10)
+            # Prefs can be ignored by an existing profile, so also set it through DevTools
+            self.driver.execute_cdp_cmd("Page.setDownloadBehavior", {
+                "behavior": "allow",
+                "downloadPath": str(self.temp_dir),
+            })
+            self.watcher = DownloadWatcher(self.temp_dir)
             print("✅ Chrome driver setup successful")
         except Exception as e:
             print(f"❌ Error setting up Chrome driver: {e}")
             raise
 
+        if self.use_cdp:
+            try:
+                tracker = CDPDownloadTracker(self.driver, self.temp_dir)
+                tracker.start()
+                self.tracker = tracker
+                print("✅ Tracking downloads through Chrome DevTools")
+            except Exception as e:
+                print(f"⚠️ DevTools download tracking not available, watching the folder instead: {e}")
+
     def wait_for_download_complete(self, timeout=15):
-        """Wait for any downloads to complete"""
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            # Check for .crdownload files (Chrome's temporary download files)
-            downloading = list(self.temp_dir.glob("*.crdownload"))
-            if not downloading:
-                time.sleep(0.015)  # Small buffer to ensure file is fully written
-                return True
-            time.sleep(0.25)
-        return False
+        """Wait for the download just triggered to complete.
 
-    def move_downloaded_files(self, factura_number):
-        """Move downloaded files from temp directory to organized folders"""
+        Returns the finished file's Path when the watcher knows it (inotify),
+        True when it only knows nothing is downloading anymore, False on timeout.
+        """
+        if self.watcher is None:
+            self.watcher = DownloadWatcher(self.temp_dir)
+        return self.watcher.wait(timeout)
+
+    def destination_path(self, dest_dir, factura_number, suffix):
+        """Build a free destination path named after the factura number"""
+        # Use factura number as filename
+        clean_name = "".join(c for c in factura_number if c.isalnum() or c in ('-', '_', ' ')).strip()
+        # Insert space between 'Facturas' and 'Number' if needed
+        clean_name = re.sub(r'(Facturas)(Number)', r'\1 \2', clean_name)
+        if not clean_name:
+            clean_name = f"documento_{int(time.time())}"
+
+        # Handle duplicate filenames: "name_1", "name_2"... picked from the index and reserved at once.
+        # The index only knows this run's names, place_file() and reserve_path() guard against other runs
+        return self.names.claim(dest_dir, clean_name, suffix)
+
+    def place_file(self, source, dest_path, factura_number):
+        """Move a finished file to dest_path, or to the next free name if another run created that one.
+
+        Never replaces an existing file: the hard link fails when the name is taken, and the
+        index, which already counts that name as used, then hands out the next one.
+        """
+        source = Path(source)
+        while True:
+            try:
+                os.link(source, dest_path)
+                source.unlink()
+                return dest_path
+            except FileExistsError:
+                pass
+            except OSError:
+                # No hard links on this filesystem: reserve the name with an exclusive create instead
+                try:
+                    open(dest_path, "xb").close()
+                except FileExistsError:
+                    pass
+                else:
+                    try:
+                        source.replace(dest_path)
+                    except OSError:
+                        dest_path.unlink(missing_ok=True)
+                        raise
+                    return dest_path
+            dest_path = self.destination_path(dest_path.parent, factura_number, dest_path.suffix)
+
+    def reserve_path(self, dest_dir, factura_number, suffix):
+        """Claim a free name and create the file empty, for a file another process writes later"""
+        while True:
+            dest_path = self.destination_path(dest_dir, factura_number, suffix)
+            try:
+                open(dest_path, "xb").close()
+                return dest_path
+            except FileExistsError:
+                continue  # created by another run since the folder was listed, the index now has it
+
+    def save_document(self, factura_number, file_type, data, suffix):
+        """Write downloaded bytes straight into the output folder"""
+        dest_dir = self.pdf_dir if file_type == "PDF" else self.xml_dir
+        with self.metrics.timer("move"):
+            dest_path = self.destination_path(dest_dir, factura_number, suffix)
+            # Write next to the destination first, so a crash never leaves a truncated document
+            # (the session id keeps the temporary name apart from other runs picking the same name)
+            part_path = dest_path.with_name(f"{dest_path.name}.{self.session_id}.part")
+            part_path.write_bytes(data)
+            dest_path = self.place_file(part_path, dest_path, factura_number)
+        print(f"  📁 {file_type} saved as: {dest_path.name}")
+        return dest_path
+
+    def throttle(self):
+        """Wait for the shared rate limiter before a request reaches the portal"""
+        if self.rate_limiter:
+            # Time spent waiting here is not the portal being slow, keep it out of the pacing
+            self.pacing.paused += self.rate_limiter.acquire()
+
+    def wanted_types(self, row):
+        """File types of a document still to download (e.g. the XML may already come from the web service)"""
+        saved = self.manifest.saved_types(row)
+        return [file_type for file_type in self.required_types if file_type not in saved]
+
+    def download_via_http(self, row):
+        """Download the missing files of a row through the HTTP engine, without the browser"""
+        saved_files = []
+        for file_type in self.wanted_types(row):
+            try:
+                self.throttle()
+                with self.metrics.timer("http_request"):
+                    filename, data = self.http_engine.fetch(row["index"], file_type)
+                suffix = Path(filename).suffix.lower() or DEFAULT_SUFFIX[file_type]
+                print(f"  ✅ {file_type} ({len(data)} bytes)")
+                saved_files.append((file_type, self.save_document(row["factura"], file_type, data, suffix)))
+            except Exception as e:
+                print(f"  ⚠️ {file_type} error: {e}")
+        self.record_files(row, saved_files)
+        return saved_files
+
+    def record_files(self, row, saved_files):
+        """Remember in the manifest and the session journal which files of a document are on disk"""
         try:
-            # Look for recently downloaded files (last 20 seconds)
-            recent_files = []
-            now = time.time()
+            if not saved_files:
+                self.manifest.mark_failed(row)
+            for file_type, path in saved_files:
+                self.manifest.record_file(row, file_type, path)
+        except Exception as e:
+            print(f"  ⚠️ Could not update manifest: {e}")
 
-            for file_path in self.temp_dir.iterdir():
-                if file_path.is_file() and (now - file_path.stat().st_mtime) < 20:
-                    if file_path.suffix.lower() in ['.pdf', '.xml']:
-                        recent_files.append(file_path)
+        statuses = {file_type: "ok" for file_type, _ in saved_files}
+        try:
+            # Files saved earlier count too, e.g. the XMLs the web service already delivered
+            statuses.update((file_type, "ok") for file_type in self.manifest.saved_types(row))
+        except Exception as e:
+            print(f"  ⚠️ Could not read manifest: {e}")
+        if not statuses:
+            statuses = {"XML": "failed", "PDF": "failed"}
+        try:
+            self.journal.record_document(self.page_number, row["index"], statuses)
+        except Exception as e:
+            print(f"  ⚠️ Could not update session journal: {e}")
+
+    def report_result(self, row, seconds=None, paused=None, source="portal", status=None):
+        """Build the DownloadResult of one document from the manifest and append it to the result stream"""
+        files = {}
+        entry = None
+        try:
+            entry = self.manifest.get(row)
+        except Exception as e:
+            print(f"  ⚠️ Could not read manifest: {e}")
+        for file_type in ("XML", "PDF"):
+            prefix = file_type.lower()
+            path = entry[f"{prefix}_path"] if entry else None
+            if path and Path(path).exists():
+                files[file_type] = (path, entry[f"{prefix}_size"])
+        if status is None:
+            if all(file_type in files for file_type in self.required_types):
+                status = "complete"
+            else:
+                status = "partial" if files else "failed"
+
+        result = DownloadResult(
+            self.manifest.key_for(row), status, session=self.session_id, source=source,
+            page=self.page_number if source == "portal" else (entry["page"] if entry else None),
+            index=row.get("index"), factura=row.get("factura"), clave_acceso=row.get("clave_acceso"),
+            xml_path=files.get("XML", (None, None))[0], xml_bytes=files.get("XML", (None, None))[1],
+            pdf_path=files.get("PDF", (None, None))[0], pdf_bytes=files.get("PDF", (None, None))[1],
+            seconds=round(seconds, 3) if seconds is not None else None,
+            paused_seconds=round(paused, 3) if paused is not None else None,
+        )
+        try:
+            self.results.write(result)
+        except Exception as e:
+            print(f"  ⚠️ Could not write result record: {e}")
+        return result
+
+    def move_downloaded_files(self, factura_number, files=None):
+        """Move downloaded files from temp directory to organized folders"""
+        try:
+            if files:
+                # The watcher already told us exactly which files finished
+                recent_files = [f for f in files if f.suffix.lower() in ['.pdf', '.xml']]
+            else:
+                # The staging folder only holds this session's downloads, anything left there is ours
+                # (scandir knows the entry types without a stat per file)
+                with os.scandir(self.temp_dir) as entries:
+                    recent_files = [Path(entry.path) for entry in entries
+                                    if entry.is_file() and Path(entry.name).suffix.lower() in ['.pdf', '.xml']]
 
             moved_files = []
             for file_path in recent_files:
@@ -87,24 +500,10 @@ class SRIDownloader:
                 else:
                     continue
 
-                # Use factura number as filename
-                clean_name = "".join(c for c in factura_number if c.isalnum() or c in ('-', '_', ' ')).strip()
-                # Insert space between 'Facturas' and 'Number' if needed
-                clean_name = re.sub(r'(Facturas)(Number)', r'\1 \2', clean_name)
-                if not clean_name:
-                    clean_name = f"documento_{int(time.time())}"
-
-                dest_path = dest_dir / f"{clean_name}{file_path.suffix.lower()}"
-
-                # Handle duplicate filenames
-                counter = 1
-                original_dest = dest_path
-                while dest_path.exists():
-                    dest_path = original_dest.with_stem(f"{original_dest.stem}_{counter}")
-                    counter += 1
+                dest_path = self.destination_path(dest_dir, factura_number, file_path.suffix.lower())
 
-                # Move file
-                shutil.move(str(file_path), str(dest_path))
+                # Move file (a link and unlink, staging and output folders share the filesystem)
+                dest_path = self.place_file(file_path, dest_path, factura_number)
                 moved_files.append((file_type, dest_path))
                 print(f"  📁 {file_type} saved as: {dest_path.name}")
 
@@ -114,111 +513,347 @@ class SRIDownloader:
             print(f"  ⚠️ Error organizing files: {e}")
             return []
 
-    def download_document_by_index(self, index):
-        """Download both XML and PDF for a document by its index"""
+    def cleanup_staging_dir(self):
+        """Remove this session's staging folder if every download was moved out of it"""
+        try:
+            self.temp_dir.rmdir()
+            self.temp_dir.parent.rmdir()  # Only succeeds when no other session is staging
+        except OSError:
+            pass
+
+    def _click_download(self, link_id, file_type, available=None):
+        """Click a download link; returns a handle to wait on, or None if nothing was clicked.
 
+        `available` comes from the page snapshot; when given, the link is clicked by id
+        without looking it up and checking it first.
+        """
         try:
-            # Construct the specific link IDs for this row
-            xml_link_id = f"frmPrincipal:tablaCompRecibidos:{index}:lnkXml"
-            pdf_link_id = f"frmPrincipal:tablaCompRecibidos:{index}:lnkPdf"
+            if available is None:
+                with self.metrics.timer("locate"):
+                    link = self.driver.find_element(By.ID, link_id)
+                    available = link.is_displayed() and link.is_enabled()
+            if not available:
+                print(f"  ⚠️ {file_type} not available")
+                return None
 
-            # Get the invoice number from column 3 (index 2)
-            factura_number = f"documento_{index}"
-            try:
-                # Find the XML link first to get its row
-                xml_link = self.driver.find_element(By.ID, xml_link_id)
-                row = xml_link.find_element(By.XPATH, "./ancestor::tr")
-                cells = row.find_elements(By.TAG_NAME, "td")
-
-                # Get invoice number from column 3 (index 2)
-                if len(cells) >= 3:
-                    factura_cell = cells[2]
-                    factura_text = factura_cell.text.strip()
-                    if factura_text and len(factura_text) > 0:
-                        factura_number = factura_text
+            if self.tracker:
+                self.tracker.discard_unclaimed()
+            else:
+                self.watcher.discard_pending()
+            self.throttle()
+            with self.metrics.timer("click"):
+                clicked = self.driver.execute_script(
+                    "var link = document.getElementById(arguments[0]); if (link) { link.click(); } return !!link;",
+                    link_id)
+            if not clicked:
+                raise NoSuchElementException(link_id)
+
+            if self.tracker:
+                started = time.perf_counter()
+                guid = self.tracker.claim_next()
+                if guid is None:
+                    self.metrics.observe("download_wait", time.perf_counter() - started)
+                    print(f"  ⚠️ {file_type} download did not start")
+                    self.drop_closed_tracker()
+                else:
+                    self.claim_seconds[guid] = time.perf_counter() - started
+                return guid
+            return True
+        except NoSuchElementException:
+            print(f"  ⚠️ {file_type} link not found")
+        except Exception as e:
+            print(f"  ⚠️ {file_type} error: {e}")
+        return None
+
+    def drop_closed_tracker(self):
+        """Fall back to the folder watcher once the DevTools connection died mid-run.
+
+        Chrome keeps naming downloads after their GUID until told otherwise, and the
+        watcher only picks up .pdf/.xml files, so the plain download behaviour is restored first.
+        """
+        if not (self.tracker and self.tracker.closed):
+            return
+        print(f"⚠️ DevTools download tracking stopped ({self.tracker.error or 'connection closed'}), "
+              "watching the folder instead")
+        self.tracker = None
+        try:
+            self.driver.execute_cdp_cmd("Browser.setDownloadBehavior", {
+                "behavior": "allow",
+                "downloadPath": str(self.temp_dir),
+            })
+        except Exception as e:
+            print(f"⚠️ Could not restore the download behaviour: {e}")
+        if self.watcher is None:
+            self.watcher = DownloadWatcher(self.temp_dir)
+
+    def _record_download(self, file_type, finished, downloads_successful, finished_files):
+        """Report the outcome of one download and remember the file when its path is known"""
+        if not finished:
+            print(f"  ⚠️ {file_type} timeout")
+            return
+        downloads_successful.append(file_type)
+        if isinstance(finished, Path):
+            finished_files.append(finished)
+            print(f"  ✅ {file_type} ({finished.name})")
+        else:
+            print(f"  ✅ {file_type}")
+
+    def parse_row(self, raw):
+        """Turn the raw cells of a table row into a document record"""
+        cells = [(cell or "").strip() for cell in raw["cells"]]
+        row_text = "\n".join(cells)
+
+        # Column 2 holds "RUC - Razón social" of the issuer, column 3 the invoice number
+        emisor_cell = cells[1] if len(cells) >= 2 else ""
+        ruc_match = RUC_PATTERN.search(emisor_cell) or RUC_PATTERN.search(row_text)
+        ruc = ruc_match.group(0) if ruc_match else ""
+        emisor = RUC_PATTERN.sub("", emisor_cell).strip(" -\n\t")
+        clave_match = CLAVE_ACCESO_PATTERN.search(row_text)
+        # The emission date is the last date in the row, after the authorization date
+        dates = DATE_PATTERN.findall(row_text)
+
+        return {
+            "index": raw["index"],
+            "factura": (cells[2] if len(cells) >= 3 else "") or f"documento_{raw['index']}",
+            "emisor": emisor,
+            "ruc": ruc,
+            "fecha": dates[-1] if dates else "",
+            "clave_acceso": clave_match.group(0) if clave_match else "",
+            "xml_available": bool(raw["xml"]),
+            "pdf_available": bool(raw["pdf"]),
+        }
 
+    def snapshot_current_page(self):
+        """Read every row of the current page with a single script execution"""
+        with self.metrics.timer("locate"):
+            raw_rows = self.driver.execute_script(SNAPSHOT_ROWS_SCRIPT) or []
+        return [self.parse_row(raw) for raw in raw_rows]
+
+    def get_factura_number(self, index):
+        """Read the invoice number of a row from column 3 (index 2)"""
+        factura_number = f"documento_{index}"
+        try:
+            # Find the XML link first to get its row
+            xml_link = self.driver.find_element(By.ID, f"frmPrincipal:tablaCompRecibidos:{index}:lnkXml")
+            row = xml_link.find_element(By.XPATH, "./ancestor::tr")
+            cells = row.find_elements(By.TAG_NAME, "td")
+
+            # Get invoice number from column 3 (index 2)
+            if len(cells) >= 3:
+                factura_cell = cells[2]
+                factura_text = factura_cell.text.strip()
+                if factura_text and len(factura_text) > 0:
+                    factura_number = factura_text
+
+        except Exception as e:
+            print(f"  🔍 Could not extract invoice number: {e}")
+        return factura_number
+
+    async def _fetch_async(self, semaphore, row, file_type):
+        """Fetch one file on a worker thread, at most `concurrency` at a time.
+
+        Also returns when the file got its slot, the start of its row's time in the result stream.
+        """
+        async with semaphore:
+            submitted = time.monotonic()
+            try:
+                await asyncio.to_thread(self.throttle)
+                started = time.perf_counter()
+                filename, data = await asyncio.to_thread(self.http_engine.fetch, row["index"], file_type)
+                self.metrics.observe("http_request", time.perf_counter() - started)
+                return row, file_type, filename, data, None, submitted
             except Exception as e:
-                print(f"  🔍 Could not extract invoice number: {e}")
+                return row, file_type, None, None, e, submitted
 
+    async def _download_rows_async(self, rows):
+        """Run the XML and PDF requests of many rows together, yielding each row's result once its files landed"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        row_started = {}  # when the first file of each row was submitted
+        tasks = []
+        remaining = {}  # files of each row still in flight, its result is reported when the last one lands
+        for row in rows:
+            file_types = self.wanted_types(row)
+            remaining[row["index"]] = len(file_types)
+            tasks.extend(asyncio.ensure_future(self._fetch_async(semaphore, row, file_type))
+                         for file_type in file_types)
+
+        saved_rows = set()
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                row, file_type, filename, data, error, submitted = await next_done
+                row_started[row["index"]] = min(submitted, row_started.get(row["index"], submitted))
+                if error:
+                    print(f"  ⚠️ Document {row['index'] + 1} {file_type} error: {error}")
+                else:
+                    suffix = Path(filename).suffix.lower() or DEFAULT_SUFFIX[file_type]
+                    print(f"  ✅ Document {row['index'] + 1} {file_type} ({len(data)} bytes)")
+                    # Saving stays on the event loop thread, so duplicate-name handling never races
+                    path = self.save_document(row["factura"], file_type, data, suffix)
+                    self.record_files(row, [(file_type, path)])
+                    saved_rows.add(row["index"])
+                remaining[row["index"]] -= 1
+                if not remaining[row["index"]]:
+                    if row["index"] not in saved_rows:
+                        self.record_files(row, [])
+                    yield self.report_result(row, time.monotonic() - row_started[row["index"]])
+        finally:
+            # The caller may stop reading early, drop the requests still queued
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def download_rows_concurrently(self, rows):
+        """Download a page through the HTTP engine with many requests in flight, yielding each row's result"""
+        print(f"⚡ Fetching {sum(len(self.wanted_types(row)) for row in rows)} files, up to {self.concurrency} at a time")
+        loop = asyncio.new_event_loop()
+        results = self._download_rows_async(rows)
+        try:
+            while True:
+                try:
+                    # The pipeline runs while we wait for its next result, and pauses while the caller handles it
+                    yield loop.run_until_complete(results.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop.run_until_complete(results.aclose())
+            loop.run_until_complete(loop.shutdown_default_executor())
+            loop.close()
+
+    def download_rows(self, rows):
+        """Download rows one after the other, yielding each row's result"""
+        for row in rows:
+            yield self.download_paced(row)
+            self.pacing.pause("row")  # Small delay between downloads
+
+    def download_document_by_index(self, index, row=None):
+        """Download both XML and PDF for a document by its index.
+
+        `row` is the record from snapshot_current_page; without it the row is read from the DOM.
+        """
+
+        try:
+            # Construct the specific link IDs for this row
+            xml_link_id = f"frmPrincipal:tablaCompRecibidos:{index}:lnkXml"
+            pdf_link_id = f"frmPrincipal:tablaCompRecibidos:{index}:lnkPdf"
+
+            if row is None:
+                row = {"index": index, "factura": self.get_factura_number(index)}
+            factura_number = row["factura"]
             print(f"📄 Document {index + 1}: {factura_number}")
 
+            if self.http_engine:
+                return len(self.download_via_http(row)) > 0
+
             downloads_successful = []
+            finished_files = []
 
-            # Download XML
-            try:
-                xml_link = self.driver.find_element(By.ID, xml_link_id)
-                if xml_link.is_displayed() and xml_link.is_enabled():
-                    self.driver.execute_script("arguments[0].click();", xml_link)
-                    if self.wait_for_download_complete():
-                        downloads_successful.append("XML")
-                        print(f"  ✅ XML")
-                    else:
-                        print(f"  ⚠️ XML timeout")
+            # Download XML, then PDF (only the ones not on disk yet)
+            wanted = self.wanted_types(row)
+            links = [(t, link_id) for t, link_id in (("XML", xml_link_id), ("PDF", pdf_link_id)) if t in wanted]
+            in_flight = []
+            self.drop_closed_tracker()
+            tracker = self.tracker  # the one the in-flight GUIDs belong to, even if it is dropped meanwhile
+            for file_type, link_id in links:
+                if file_type == "PDF" and len(links) > 1:
+                    # Small delay between downloads
+                    self.pacing.pause("file")
+                available = row.get(f"{file_type.lower()}_available")
+                handle = self._click_download(link_id, file_type, available)
+                if handle is None:
+                    continue
+                if self.tracker:
+                    # Each click resolved to its own GUID, so both downloads can be in flight at once
+                    in_flight.append((file_type, handle))
                 else:
-                    print(f"  ⚠️ XML not available")
-            except NoSuchElementException:
-                print(f"  ⚠️ XML link not found")
-            except Exception as e:
-                print(f"  ⚠️ XML error: {e}")
+                    with self.metrics.timer("download_wait"):
+                        finished = self.wait_for_download_complete()
+                    self._record_download(file_type, finished, downloads_successful, finished_files)
 
-            # Small delay between downloads
-            time.sleep(0.5)
-            # if index == 0:
-            #     input(f"Have you accepted the download multiple files prompt? Press Enter to continue...{index}")
-            # Download PDF
-            try:
-                pdf_link = self.driver.find_element(By.ID, pdf_link_id)
-                if pdf_link.is_displayed() and pdf_link.is_enabled():
-                    self.driver.execute_script("arguments[0].click();", pdf_link)
-                    if self.wait_for_download_complete():
-                        downloads_successful.append("PDF")
-                        print(f"  ✅ PDF")
-                    else:
-                        print(f"  ⚠️ PDF timeout")
-                else:
-                    print(f"  ⚠️ PDF not available")
-            except NoSuchElementException:
-                print(f"  ⚠️ PDF link not found")
-            except Exception as e:
-                print(f"  ⚠️ PDF error: {e}")
+            for file_type, guid in in_flight:
+                started = time.perf_counter()
+                finished = tracker.wait(guid)
+                # One observation per file: the wait for the download to start plus the wait for it to finish
+                waited = self.claim_seconds.pop(guid, 0.0) + time.perf_counter() - started
+                self.metrics.observe("download_wait", waited)
+                self._record_download(file_type, finished, downloads_successful, finished_files)
 
-            if index == 0:
+            if index == 0 and self.interactive:
                 input(f"Have you accepted the download multiple files prompt? Press Enter to continue...{index}")
 
             # Move downloaded files to organized folders
             if downloads_successful:
-                time.sleep(0.5)  # Allow downloads to complete
-                moved_files = self.move_downloaded_files(factura_number)
+                if len(finished_files) == len(downloads_successful):
+                    # Every file was reported by name, no need to wait and rescan the folder
+                    with self.metrics.timer("move"):
+                        moved_files = self.move_downloaded_files(factura_number, finished_files)
+                else:
+                    self.pacing.pause("move")  # Allow downloads to complete, a pause rather than move time
+                    with self.metrics.timer("move"):
+                        moved_files = self.move_downloaded_files(factura_number)
+                self.record_files(row, moved_files)
                 return len(moved_files) > 0
 
+            self.record_files(row, [])
             return False
 
         except Exception as e:
             print(f"  ❌ Error processing document {index + 1}: {e}")
             return False
 
-    def download_current_page(self):
-        """Download all documents from the current page"""
+    def download_current_page(self, only_keys=None):
+        """Download all documents from the current page; returns True when the page went well.
+
+        With `only_keys` (a set of manifest keys, or a PendingKeys) only the rows among
+        only_keys.intersection() are downloaded.
+        """
+        results = self.iter_page(only_keys)
+        while True:
+            try:
+                next(results)
+            except StopIteration as done:
+                return done.value
+
+    def iter_page(self, only_keys=None):
+        """Download the current page, yielding a DownloadResult per document as soon as it is done.
+
+        Documents already on disk come first (status "skipped"), then every download in
+        the order it finishes, then the backoff retries of this page. The generator's
+        return value is download_current_page()'s.
+        """
         try:
             # Wait for the table with specific ID pattern to load
             self.wait.until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, "a[id*='tablaCompRecibidos'][id*='lnkXml']")))
 
-            # Find all XML links and extract their actual indices
-            xml_links = self.driver.find_elements(By.CSS_SELECTOR, "a[id*='tablaCompRecibidos'][id*='lnkXml']")
+            # Read every row (index, invoice number, issuer, links...) in one round trip
+            rows = self.snapshot_current_page()
+            if only_keys is not None:
+                wanted = only_keys.intersection(self.manifest.key_for(row) for row in rows)
+                rows = [row for row in rows if self.manifest.key_for(row) in wanted]
+                if not rows:
+                    print("\n⏭️ None of the wanted documents are on this page")
+                    return True
+            document_indices = [row["index"] for row in rows]
+
+            self.journal.start_page(self.page_number, document_indices)
 
-            # Extract the actual row indices from the link IDs
-            document_indices = []
-            for xml_link in xml_links:
-                link_id = xml_link.get_attribute('id')  # e.g., "frmPrincipal:tablaCompRecibidos:50:lnkXml"
-                try:
-                    # Extract the index number from the ID
-                    parts = link_id.split(':')
-                    if len(parts) >= 3 and parts[2].isdigit():
-                        index = int(parts[2])
-                        document_indices.append(index)
-                except:
+            # Skip documents an earlier run (or the interrupted session) already downloaded completely
+            pending_rows = []
+            skipped_results = []
+            for row in rows:
+                if self.journal.is_document_done(self.page_number, row["index"]):
+                    skipped_results.append(self.report_result(row, status="skipped"))
                     continue
+                if self.manifest.is_complete(row):
+                    self.journal.record_document(self.page_number, row["index"], {"XML": "ok", "PDF": "ok"})
+                    skipped_results.append(self.report_result(row, status="skipped"))
+                    continue
+                pending_rows.append(row)
+            skipped = len(skipped_results)
+
+            if self.http_engine:
+                # Paging can replace the view state, post with the one the browser has now
+                self.http_engine.refresh_from_driver(self.driver)
 
             num_documents = len(document_indices)
             print(f"\n📊 Found {num_documents} documents on this page (indices: {document_indices})")
@@ -227,14 +862,31 @@ class SRIDownloader:
                 print("⚠️ No document download links found")
                 return False
 
+            if skipped:
+                print(f"⏭️ Skipping {skipped} documents already downloaded")
+            yield from skipped_results
+
+            if self.http_engine and self.concurrency > 1:
+                downloads = self.download_rows_concurrently(pending_rows)
+            else:
+                downloads = self.download_rows(pending_rows)
+
+            # Documents still missing a file go to the retry queue, only they are retried after a backoff
+            rows_by_key = {self.manifest.key_for(row): row for row in pending_rows}
             successful = 0
-            for i, doc_index in enumerate(document_indices):
-                if self.download_document_by_index(doc_index):
+            for result in downloads:
+                if self.track_attempt(rows_by_key[result.key]):
+                    successful += 1
+                yield result
+            for result in self.retry_page_failures():
+                if result:
                     successful += 1
-                time.sleep(0.2)  # Small delay between downloads
+                yield result
 
-            print(f"\n✅ Page complete: {successful}/{num_documents} documents processed successfully")
-            return successful > 0
+            self.journal.complete_page_if_done(self.page_number)
+            print(f"\n✅ Page complete: {successful}/{len(pending_rows)} documents processed successfully"
+                  f" ({skipped} already downloaded)")
+            return successful > 0 or skipped == num_documents
 
         except TimeoutException:
             print("❌ Timeout waiting for page to load")
@@ -243,77 +895,679 @@ class SRIDownloader:
             print(f"❌ Error downloading page: {e}")
             return False
 
-    def go_to_next_page(self):
-        """Navigate to the next page"""
+    def iter_pages(self, pages=None):
+        """Library entry point: yield a DownloadResult for every document, as each one completes.
+
+        Downloads the given pages (1-based), or walks from the current page to the last
+        one, then makes the final retry sweep. Needs a logged-in browser on the listing,
+        see open_portal():
+
+            downloader = SRIDownloader(interactive=False)
+            downloader.open_portal(START_URL)
+            for result in downloader.iter_pages():
+                if result:
+                    load(result.xml_path)
+            downloader.close()
+        """
+        if pages is None:
+            while True:
+                yield from self.iter_page()
+                if not self.go_to_next_page():
+                    self.journal.finish()
+                    break
+                self.page_number += 1
+        else:
+            for page in pages:
+                if not self.go_to_page(page):
+                    print(f"⚠️ Could not open page {page}, skipping it")
+                    continue
+                self.page_number = page
+                yield from self.iter_page()
+        yield from self.iter_retry_sweep()
+
+    def download_paced(self, row):
+        """Download one row and let the pacing controller adjust to how it went; returns its DownloadResult"""
+        started = self.pacing.start()
+        with self.metrics.timer("document"):
+            ok = self.download_document_by_index(row["index"], row) and not self.wanted_types(row)
+        paused = self.pacing.paused
+        self.pacing.record(ok, started)
+        return self.report_result(row, time.monotonic() - started, paused)
+
+    def track_attempt(self, row):
+        """Update the retry queue after trying a document; returns True when nothing is missing anymore"""
+        key = self.manifest.key_for(row)
+        if not self.wanted_types(row):
+            self.retry_queue.record_success(key)
+            return True
+        if not self.retry_queue.record_failure(key, row, self.page_number):
+            print(f"  ❌ Document {row['index'] + 1} failed {self.max_attempts} times, giving up on it")
         try:
-            # Look for the next button - it should NOT have 'ui-state-disabled' class
-            next_buttons = self.driver.find_elements(By.CSS_SELECTOR, ".ui-paginator-next")
-
-            for next_button in next_buttons:
-                classes = next_button.get_attribute("class") or ""
-                if "ui-state-disabled" not in classes:
-                    # This next button is enabled
-                    self.driver.execute_script("arguments[0].click();", next_button)
-                    time.sleep(2)  # Wait for page to load
+            self.manifest.record_attempt(row)
+        except Exception as e:
+            print(f"  ⚠️ Could not update manifest: {e}")
+        return False
+
+    def retry_page_failures(self):
+        """Retry the failed documents of the current page as their backoff expires, yielding each try's result"""
+        while True:
+            entries = self.retry_queue.retryable_on_page(self.page_number)
+            if not entries:
+                return
+            self.retry_queue.wait_until_due(entries.values())
+            now = time.monotonic()
+            for entry in entries.values():
+                if entry.due > now:
+                    continue
+                print(f"🔁 Retrying document {entry.row['index'] + 1} "
+                      f"(attempt {entry.attempts + 1}/{self.max_attempts})")
+                result = self.download_paced(entry.row)
+                self.track_attempt(entry.row)
+                yield result
+
+    def retry_sweep(self):
+        """Last attempt at the documents still missing, visiting only the pages they are on"""
+        for _ in self.iter_retry_sweep():
+            pass
+
+    def iter_retry_sweep(self):
+        """retry_sweep(), yielding the result of every document it tries again"""
+        pages = self.retry_queue.pages()
+        if pages:
+            print(f"\n🧹 Final sweep: {sum(map(len, pages.values()))} documents still missing on {len(pages)} pages")
+            for page, keys in pages.items():
+                if not self.go_to_page(page):
+                    print(f"⚠️ Could not open page {page}, skipping it")
+                    continue
+                self.page_number = page
+                yield from self.iter_page(only_keys=set(keys))
+            self.retry_queue.clear()
+
+        if self.retry_queue.exhausted:
+            print(f"⚠️ {len(self.retry_queue.exhausted)} documents could not be downloaded "
+                  f"after {self.max_attempts} attempts")
+            self.retry_queue.exhausted.clear()
+
+    def wait_for_page_change(self, old_page, timeout=20, settle=0.5):
+        """Wait until the paginator AJAX request finished and the table shows another page.
+
+        Returns False as soon as the AJAX queue is idle but the page did not change.
+        """
+        start = time.monotonic()
+        while time.monotonic() - start < timeout:
+            state = self.driver.execute_script(PAGE_STATE_SCRIPT)
+            if not state["busy"]:
+                changed = old_page is None or state["page"] != old_page
+                if changed and state["stale"]:
+                    return True
+                if time.monotonic() - start > settle:
+                    print(f"❌ Page did not change after paging (still on page {state['page']})")
+                    return False
+            time.sleep(0.05)
+        print(f"❌ Timeout waiting for the next page after {timeout}s")
+        return False
+
+    def go_to_next_page(self, attempts=NEXT_PAGE_ATTEMPTS):
+        """Navigate to the next page.
+
+        Returns True on the next page and False when "next" is disabled, the end of the
+        listing. Raises NavigationError when paging keeps failing, so callers never take a
+        slow AJAX answer for the end of the listing.
+        """
+        target = None  # page number "next" should land on, so a retry never skips a page
+        for attempt in range(1, attempts + 1):
+            if attempt > 1:
+                delay = 2 ** (attempt - 1)
+                print(f"🔁 Trying the next page again in {delay}s (attempt {attempt}/{attempts})")
+                time.sleep(delay)
+            try:
+                old_page = self.driver.execute_script(MARK_PAGE_SCRIPT)
+                if target is not None and old_page == target:
+                    # The previous click landed after all, only too late
                     print("✅ Navigated to next page")
                     return True
+                if attempt == 1 and old_page and old_page.isdigit():
+                    target = str(int(old_page) + 1)
 
-            print("⚠️ Next page button is disabled - no more pages")
-            return False
+                # Look for the next button - it should NOT have 'ui-state-disabled' class
+                next_buttons = self.driver.find_elements(By.CSS_SELECTOR, ".ui-paginator-next")
+                next_buttons = [button for button in next_buttons
+                                if "ui-state-disabled" not in (button.get_attribute("class") or "")]
+                if not next_buttons:
+                    if attempt == 1:
+                        print("⚠️ Next page button is disabled - no more pages")
+                        return False
+                    print("❌ Next page button disabled before reaching the next page")
+                    continue
+
+                self.throttle()
+                started = self.pacing.start()
+                with self.metrics.timer("page_navigation"):
+                    self.driver.execute_script("arguments[0].click();", next_buttons[0])
+                    changed = self.wait_for_page_change(old_page)
+                self.pacing.record(changed, started, document=False)
+                if changed:
+                    print("✅ Navigated to next page")
+                    return True
+            except Exception as e:
+                print(f"❌ Error navigating to next page: {e}")
+            if target is None:
+                break  # without the page number a second click could skip a page
+        raise NavigationError(f"Could not reach the next page after {attempt} attempts")
 
+    def wait_for_documents_table(self, timeout):
+        """Wait until the documents table shows up (login done and query run)"""
+        WebDriverWait(self.driver, timeout).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "a[id*='tablaCompRecibidos'][id*='lnkXml']")))
+
+    def ask_next_action(self):
+        """Ask user what to do next"""
+        print(f"\nOptions:")
+        print("  [y] Go to next page")
+        print("  [n] Stop downloading")
+        print("  [r] Retry current page")
+        return input("Choose option (y/n/r): ").lower().strip()
+
+    def next_batch_action(self, page_ok=True, attempts=1):
+        """Decide without prompting: failed documents are already in the retry queue, so move on.
+
+        A page that failed before any of its rows was tried (table not loaded, no links)
+        has nothing queued, it is loaded again after a backoff, up to max_attempts times.
+        """
+        if not page_ok and not self.journal.is_page_started(self.page_number):
+            if attempts < self.max_attempts:
+                delay = self.retry_queue.delay(attempts)
+                print(f"🔁 Page {self.page_number} failed before any document, retrying in {delay:.0f}s "
+                      f"({attempts}/{self.max_attempts})")
+                time.sleep(delay)
+                return 'r'
+            print(f"⚠️ Page {self.page_number} failed {attempts} times, moving on without it")
+            return 'y'
+        if not self.journal.is_page_complete(self.page_number):
+            print(f"⚠️ Page {self.page_number} incomplete, its missing documents wait for the final sweep")
+        return 'y'
+
+    def maximize_rows_per_page(self):
+        """Switch the table to its largest rows-per-page option, so fewer pages need loading"""
+        try:
+            self.driver.execute_script(MARK_PAGE_SCRIPT)
+            self.throttle()
+            result = self.driver.execute_script(MAX_ROWS_SCRIPT)
+            if not result:
+                print("ℹ️ No rows-per-page selector found, keeping the page size")
+                return False
+            if result["changed"] and not self.wait_for_page_change(None):
+                return False
+            print(f"✅ Showing {result['rows']} rows per page")
+            return True
         except Exception as e:
-            print(f"❌ Error navigating to next page: {e}")
+            print(f"⚠️ Could not change rows per page: {e}")
             return False
 
-    def run(self, start_url):
-        """Main execution method"""
-        try:
-            print("🚀 Starting SRI Document Downloader")
-            print(f"📁 PDF files will be saved to: {self.pdf_dir}")
-            print(f"📁 XML files will be saved to: {self.xml_dir}")
+    def page_count(self):
+        """Number of pages in the listing, or None if the paginator widget is not found"""
+        paginator = self.driver.execute_script(PAGINATOR_SCRIPT)
+        return paginator["pages"] if paginator else None
 
-            self.setup_driver()
+    def row_count(self):
+        """Number of documents the current query found, or None if unknown"""
+        paginator = self.driver.execute_script(PAGINATOR_SCRIPT)
+        return paginator["rows"] if paginator else None
 
-            print(f"\n🌐 Navigating to SRI portal...")
-            self.driver.get(start_url)
+    def wait_for_ajax_idle(self, timeout=20):
+        """Wait until PrimeFaces has no AJAX request pending"""
+        WebDriverWait(self.driver, timeout, poll_frequency=0.05).until(
+            lambda driver: not driver.execute_script(PAGE_STATE_SCRIPT)["busy"])
 
-            print("\n🔑 Please login manually and navigate to the documents page.")
-            print("   Make sure the table with documents is visible.")
-            input("   Press Enter when ready to start downloading...")
+    def export_session(self):
+        """Cookies (all domains), sessionStorage and search form values of the logged in browser"""
+        session = self.driver.execute_script(EXPORT_SESSION_SCRIPT)
+        session["cookies"] = self.driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+        return session
 
-            page_count = 0
-            total_success = 0
+    def import_session(self, session, search=True):
+        """Log this browser in with a session exported from another one and (optionally) rerun its search"""
+        cookies = []
+        for cookie in session["cookies"]:
+            params = {field: cookie[field] for field in COOKIE_FIELDS if field in cookie}
+            if cookie.get("session"):
+                params.pop("expires", None)
+            cookies.append(params)
+        self.driver.execute_cdp_cmd("Network.setCookies", {"cookies": cookies})
 
-            while True:
-                page_count += 1
-                print(f"\n{'=' * 50}")
-                print(f"📄 Processing Page {page_count}")
-                print('=' * 50)
+        # sessionStorage is per tab, so seed it before the portal's own scripts run
+        self.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
+            "source": "if (location.origin === %s) { var s = %s; for (var k in s) {"
+                      " if (sessionStorage.getItem(k) === null) { sessionStorage.setItem(k, s[k]); } } }"
+                      % (json.dumps(session["origin"]), json.dumps(session["sessionStorage"])),
+        })
+        self.driver.get(session["url"])
+        if search:
+            self.run_search(session["fields"])
 
-                if self.download_current_page():
-                    total_success += 1
-                else:
-                    print("⚠️ No successful downloads on this page")
+    def run_search(self, fields, timeout=60):
+        """Fill the search form with (id, value) pairs, press "Consultar" and wait for the results.
 
-                # Ask user what to do next
-                print(f"\nOptions:")
-                print("  [y] Go to next page")
-                print("  [n] Stop downloading")
-                print("  [r] Retry current page")
+        Returns False when the query found no documents.
+        """
+        self.wait_for_ajax_idle()
+        for field_id, value in fields:
+            if self.driver.execute_script(SET_FIELD_SCRIPT, field_id, value):
+                self.wait_for_ajax_idle()
 
-                choice = input("Choose option (y/n/r): ").lower().strip()
+        self.driver.execute_script(MARK_PAGE_SCRIPT)
+        self.throttle()
+        for button_id in SEARCH_BUTTON_IDS:
+            clicked = self.driver.execute_script(
+                "var b = document.getElementById(arguments[0]); if (b) { b.click(); } return !!b;", button_id)
+            if clicked:
+                break
+        else:
+            raise RuntimeError("Search button not found on the page")
 
-                if choice == 'n':
-                    break
-                elif choice == 'r':
+        def results_ready(driver):
+            state = driver.execute_script(SEARCH_STATE_SCRIPT)
+            return state if state["ready"] else False
+
+        state = WebDriverWait(self.driver, timeout, poll_frequency=0.1).until(results_ready)
+        return not state["empty"]
+
+    def download_shard(self, shard, base_fields, max_rows=None):
+        """Search one date shard and download all its pages.
+
+        Returns smaller shards to queue instead when the shard found more than max_rows documents.
+        """
+        print(f"\n🗓️ Searching shard {shard.label}")
+        if not self.run_search(shard_fields(shard, base_fields)):
+            print(f"ℹ️ Shard {shard.label}: no documents")
+            return []
+        if self.maximize_rows:
+            self.maximize_rows_per_page()
+
+        rows = self.row_count()
+        if max_rows and rows and rows > max_rows:
+            children = split_shard(shard)
+            if children:
+                print(f"✂️ Shard {shard.label} has {rows} documents, splitting it into {len(children)} days")
+                return children
+
+        self.journal.scope = shard.label
+        pages = self.page_count() or 1
+        print(f"📊 Shard {shard.label}: {rows} documents on {pages} pages")
+        self.download_pages(range(1, pages + 1))
+        return []
+
+    def prepare_downloads(self):
+        """Set up the table and download engine once the documents page is showing"""
+        if self.maximize_rows:
+            self.maximize_rows_per_page()
+
+        if self.engine == "http":
+            self.http_engine = HTTPDownloadEngine.from_driver(self.driver, pool_size=max(4, self.concurrency))
+            print("✅ Session exported, downloading through direct HTTP requests")
+
+    def download_pages(self, pages):
+        """Download the given pages (1-based) of the listing, jumping straight to each one"""
+        successful_pages = 0
+        for page in pages:
+            if not self.go_to_page(page):
+                print(f"⚠️ Could not open page {page}, skipping it")
+                continue
+            self.page_number = page
+            if self.download_current_page():
+                successful_pages += 1
+        self.retry_sweep()
+        return successful_pages
+
+    def enumerate_listing(self):
+        """Phase 1: walk every page and record each row in the manifest, without downloading.
+
+        Returns the number of documents listed.
+        """
+        page = 1
+        total = 0
+        while True:
+            self.wait.until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "a[id*='tablaCompRecibidos'][id*='lnkXml']")))
+            rows = self.snapshot_current_page()
+            self.manifest.record_listing(rows, page, self.session_id)
+            total += len(rows)
+            print(f"📋 Page {page}: {len(rows)} documents listed ({total} so far)")
+            if not self.go_to_next_page():
+                break
+            page += 1
+        return total
+
+    def download_listed(self):
+        """Phase 2: visit only the pages with documents that are not on disk yet, showing an ETA"""
+        pending = self.manifest.pending_pages(self.session_id)
+        total_pending = sum(pending.values())
+        print(f"\n📦 {total_pending} documents to download on {len(pending)} pages")
+        if not pending:
+            return 0
+
+        if self.workers > 1:
+            return WorkerPool(self, self.workers, self.max_workers).run(pages=list(pending))
+
+        start = time.monotonic()
+        done = 0
+        for page, count in pending.items():
+            if not self.go_to_page(page):
+                print(f"⚠️ Could not open page {page}, skipping it")
+                continue
+            self.page_number = page
+            self.download_current_page()
+            done += count
+            rate = done / (time.monotonic() - start)
+            eta = (total_pending - done) / rate if rate else 0
+            print(f"⏱️ {done}/{total_pending} documents, {rate * 60:.1f} docs/min, ETA {eta / 60:.1f} min")
+        self.retry_sweep()
+        return len(pending)
+
+    def ingest_report(self, path, batch_size=500):
+        """Load the portal's "descargar reporte" TXT into the manifest; returns its listing id"""
+        listing_id = f"report:{self.session_id}"
+        batch = []
+        total = 0
+        for record in iter_report(path):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                self.manifest.record_listing(batch, None, listing_id)
+                total += len(batch)
+                batch = []
+        if batch:
+            self.manifest.record_listing(batch, None, listing_id)
+            total += len(batch)
+        print(f"📋 {total} comprobantes read from {Path(path).name}")
+        return listing_id
+
+    def fetch_xml_via_soap(self, listing_id):
+        """Download the XML of every listed document from the SRI autorización web service.
+
+        Only needs the access keys, so no browser click is spent on XMLs; returns the number saved.
+        """
+        rows = self.manifest.missing_rows(listing_id, "XML")
+        if not rows:
+            return 0
+        concurrency = max(4, self.concurrency)
+        print(f"\n🛰️ Fetching {len(rows)} XMLs from the autorización web service, {concurrency} at a time")
+
+        client = AutorizacionClient(self.soap_url, concurrency=concurrency, rate_limiter=self.rate_limiter,
+                                    metrics=self.metrics)
+        saved = 0
+        start = time.monotonic()
+        try:
+            for row, data, error, seconds in client.fetch_many(rows, key=lambda row: row["clave_acceso"]):
+                if error:
+                    print(f"  ⚠️ {row['factura'] or row['clave_acceso']}: {error}")
                     continue
-                elif choice == 'y':
-                    if not self.go_to_next_page():
-                        print("📄 No more pages available or error navigating")
-                        break
-                else:
-                    print("Invalid choice, stopping...")
+                path = self.save_document(row["factura"] or row["clave_acceso"], "XML", data, ".xml")
+                try:
+                    self.manifest.record_file(row, "XML", path)
+                except Exception as e:
+                    print(f"  ⚠️ Could not update manifest: {e}")
+                self.report_result(row, seconds, source="soap")
+                saved += 1
+        finally:
+            client.close()
+
+        elapsed = max(time.monotonic() - start, 0.001)
+        print(f"✅ {saved}/{len(rows)} XMLs from the web service ({saved / elapsed * 60:.1f} docs/min)")
+        return saved
+
+    def render_missing_rides(self):
+        """Render the RIDE PDF of every downloaded XML that has no PDF yet, on a process pool"""
+        rows = self.manifest.unrendered_rows()
+        if not rows:
+            return 0
+        print(f"\n🖨️ Rendering {len(rows)} RIDE PDFs from their XML")
+
+        # Destination names are picked and created empty here, so parallel renders never collide
+        jobs = []
+        for row in rows:
+            factura_number = row["factura"] or row["clave_acceso"] or Path(row["xml_path"]).stem
+            jobs.append((row["xml_path"], self.reserve_path(self.pdf_dir, factura_number, ".pdf")))
+        rows_by_xml = {row["xml_path"]: row for row in rows}
+
+        rendered = 0
+        for xml_path, pdf_path, error in render_many(jobs):
+            row = rows_by_xml[xml_path]
+            if error:
+                print(f"  ⚠️ {Path(xml_path).name}: {error}")
+                pdf_path.unlink(missing_ok=True)
+                self.names.release(pdf_path)
+                continue
+            try:
+                self.manifest.record_file(row, "PDF", pdf_path)
+            except Exception as e:
+                print(f"  ⚠️ Could not update manifest: {e}")
+            self.report_result(row, source="ride")
+            rendered += 1
+        print(f"✅ {rendered}/{len(rows)} RIDE PDFs rendered")
+        return rendered
+
+    def download_by_keys(self, listing_id):
+        """Walk the listing downloading only the rows a report listed and still lacks, stopping once all are found.
+
+        The manifest is asked about each page's keys, so a large report is never loaded in
+        memory. Rows are still clicked (or replayed) by their index on the page: the portal
+        has no way to open a document by its access key.
+        """
+        pending = PendingKeys(self.manifest, listing_id)
+        print(f"📦 {len(pending)} documents of the report still to download")
+        page = 1
+        while pending:
+            self.page_number = page
+            self.download_current_page(only_keys=pending)
+            if page == 1 and pending.checked and not pending.access_keys:
+                # Rows without an access key are stored as "factura|ruc", no report key can match them
+                print("⚠️ The listing shows no access keys, the report's documents cannot be found in it")
+                break
+            if not pending or not self.go_to_next_page():
+                break
+            page += 1
+        if pending:
+            print(f"⚠️ {len(pending)} documents of the report were not found in the listing")
+        self.retry_sweep()
+        return page
+
+    def export_metrics(self):
+        """Write the stage timings as JSON and as a Prometheus text file next to the manifest"""
+        if not self.metrics.histograms:
+            return
+        json_path = self.base_dir / f"metrics_{self.session_id}.json"
+        prometheus_path = self.base_dir / f"metrics_{self.session_id}.prom"
+        try:
+            self.metrics.write(json_path, prometheus_path)
+        except OSError as e:
+            print(f"⚠️ Could not write metrics: {e}")
+            return
+        print("\n⏱️ Time per stage:")
+        for line in self.metrics.summary():
+            print(f"   {line}")
+        print(f"📈 Metrics written to {json_path.name} and {prometheus_path.name}")
+
+    def export_results(self, **run):
+        """Close the result stream and write the run summary JSON next to it"""
+        summary_path = self.base_dir / f"summary_{self.session_id}.json"
+        try:
+            summary = self.results.write_summary(summary_path, session_id=self.session_id,
+                                                 manifest=self.manifest.counts(), **run)
+        except Exception as e:
+            print(f"⚠️ Could not write run summary: {e}")
+            return
+        finally:
+            self.results.close()
+        if summary["records"]:
+            print(f"🧾 Documents: {summary['statuses']}, results in {self.results.path.name}")
+        print(f"🧾 Run summary written to {summary_path.name}")
+
+    def close(self):
+        """Stop every helper and close the browser"""
+        if self.http_engine:
+            self.http_engine.close()
+        if self.tracker:
+            self.tracker.stop()
+        if self.watcher:
+            self.watcher.close()
+        self.cleanup_staging_dir()
+        self.results.close()  # reopened on the next record, so a pool worker closing it is harmless
+        self.manifest.close()
+        if self.pool_worker:
+            # --resume never reads a worker's journal (the manifest remembers its downloads), don't leave it behind
+            for path in (self.journal_path, self.journal_path.with_name(self.journal_path.name + ".tmp")):
+                path.unlink(missing_ok=True)
+        if self.driver:
+            print("\nClosing browser...")
+            self.driver.quit()
+
+    def go_to_page(self, page):
+        """Jump straight to a page (1-based) through the paginator widget, stepping as a fallback"""
+        try:
+            old_page = self.driver.execute_script(MARK_PAGE_SCRIPT)
+            self.throttle()
+            started = self.pacing.start()
+            navigation_started = time.perf_counter()
+            result = self.driver.execute_script(JUMP_TO_PAGE_SCRIPT, page)
+            if result["found"]:
+                if result.get("current"):
+                    return True
+                if not result["jumped"]:
+                    print(f"⚠️ Page {page} does not exist, the listing has {result['pages']} pages")
+                    return False
+                changed = self.wait_for_page_change(old_page)
+                # One observation for the whole jump, the script call and the wait for the new page
+                self.metrics.observe("page_navigation", time.perf_counter() - navigation_started)
+                self.pacing.record(changed, started, document=False)
+                if not changed:
+                    return False
+                print(f"✅ Jumped to page {page}")
+                return True
+
+            # No paginator widget found, click "next" from the page we are on
+            current = int(old_page) if old_page and old_page.isdigit() else 1
+            if page < current:
+                # "next" only goes forward, staying here would process the wrong page as the target
+                print(f"⚠️ Cannot go back from page {current} to page {page} without the paginator widget")
+                return False
+            for _ in range(page - current):
+                if not self.go_to_next_page():
+                    return False
+            return True
+        except Exception as e:
+            print(f"❌ Error navigating to page {page}: {e}")
+            return False
+
+    def walk_pages(self, resume=False):
+        """Download the listing page by page, asking (or deciding in batch mode) what to do next"""
+        page_count = 0
+        total_success = 0
+
+        if resume:
+            journal = SessionJournal.load(self.journal_path, required=self.required_types)
+            if journal is None or journal.state["finished"]:
+                print("ℹ️ No unfinished session to resume, starting from page 1")
+            else:
+                self.journal = journal
+                resume_page = journal.resume_page()
+                print(f"⏩ Resuming session {journal.state['session_id']} at page {resume_page}")
+                if not self.go_to_page(resume_page):
+                    raise RuntimeError(f"Could not navigate back to page {resume_page}")
+                page_count = resume_page - 1
+
+        page_attempts = 0
+        while True:
+            if page_attempts == 0:
+                page_count += 1
+            page_attempts += 1
+            self.page_number = page_count
+            print(f"\n{'=' * 50}")
+            print(f"📄 Processing Page {page_count}" + (f" (attempt {page_attempts})" if page_attempts > 1 else ""))
+            print('=' * 50)
+
+            page_ok = self.download_current_page()
+            if page_ok:
+                total_success += 1
+            else:
+                print("⚠️ No successful downloads on this page")
+
+            if self.interactive:
+                choice = self.ask_next_action()
+            else:
+                choice = self.next_batch_action(page_ok, page_attempts)
+
+            if choice == 'n':
+                break
+            elif choice == 'r':
+                continue
+            elif choice == 'y':
+                page_attempts = 0
+                if not self.go_to_next_page():
+                    print("📄 No more pages available")
+                    self.journal.finish()
                     break
+            else:
+                print("Invalid choice, stopping...")
+                break
+
+        self.retry_sweep()
+        return page_count
+
+    def open_portal(self, start_url):
+        """Start Chrome, wait for the manual login to reach the documents table and get ready to download"""
+        self.setup_driver()
+
+        print(f"\n🌐 Navigating to SRI portal...")
+        self.driver.get(start_url)
+
+        print("\n🔑 Please login manually and navigate to the documents page.")
+        print("   Make sure the table with documents is visible.")
+        if self.interactive:
+            input("   Press Enter when ready to start downloading...")
+        else:
+            print(f"   Waiting up to {self.login_timeout}s for the documents table...")
+            self.wait_for_documents_table(self.login_timeout)
+
+        self.prepare_downloads()
+
+    def run(self, start_url, resume=False):
+        """Main execution method; returns False when it stopped early or left shards missing"""
+        page_count = None
+        completed = False
+        missing_shards = []
+        try:
+            print("🚀 Starting SRI Document Downloader")
+            print(f"📁 PDF files will be saved to: {self.pdf_dir}")
+            print(f"📁 XML files will be saved to: {self.xml_dir}")
+
+            self.open_portal(start_url)
+
+            if self.report_path:
+                # The report already lists every access key, so no page needs to be read for the workload
+                listing_id = self.ingest_report(self.report_path)
+                if self.soap_url:
+                    self.fetch_xml_via_soap(listing_id)
+                page_count = self.download_by_keys(listing_id)
+            elif self.listing_mode:
+                listed = self.enumerate_listing()
+                print(f"\n📋 Listed {listed} documents, manifest: {self.manifest.counts()}")
+                if self.soap_url and self.listing_mode == "enumerate":
+                    self.fetch_xml_via_soap(self.session_id)
+                page_count = self.download_listed() if self.listing_mode == "enumerate" else 0
+            elif self.date_range:
+                # One query per month/day shard, worked through by the pool
+                shards = plan_shards(*self.date_range, granularity=self.shard_by)
+                pool = WorkerPool(self, self.workers, self.max_workers)
+                page_count = pool.run_shards(shards, self.max_shard_rows)
+                missing_shards = pool.missing_shards
+            elif self.workers > 1:
+                # Split the listing's pages over several browsers sharing this login
+                page_count = WorkerPool(self, self.workers, self.max_workers).run()
+            else:
+                page_count = self.walk_pages(resume)
+
+            if self.render_ride:
+                self.render_missing_rides()
 
             print(f"\n{'=' * 50}")
             print("📊 DOWNLOAD SUMMARY")
@@ -321,21 +1575,100 @@ class SRIDownloader:
             print(f"📄 Pages processed: {page_count}")
             print(f"📁 PDF files location: {self.pdf_dir}")
             print(f"📁 XML files location: {self.xml_dir}")
-            print("✅ Download session completed!")
+            print(f"🗂️ Manifest: {self.manifest.counts()}")
+            if self.pacing.documents:
+                print(f"⏱️ {self.pacing.docs_per_minute():.1f} docs/min, final pace x{self.pacing.scale:.1f}")
+            if missing_shards:
+                print(f"⚠️ Shards not downloaded, run them again: {', '.join(missing_shards)}")
+            else:
+                print("✅ Download session completed!")
+                completed = True
 
         except KeyboardInterrupt:
             print("\n⚠️ Download interrupted by user")
+            print(f"   Run again with --resume to continue from page {self.journal.resume_page()}")
+        except NavigationError as e:
+            # Not the end of the listing: the journal stays unfinished so the run can be resumed
+            print(f"\n❌ {e}, stopping before the end of the listing")
+            print(f"   Run again with --resume to continue from page {self.journal.resume_page()}")
         except Exception as e:
             print(f"\n❌ Unexpected error: {e}")
         finally:
-            if self.driver:
-                print("\nClosing browser...")
-                self.driver.quit()
+            self.export_metrics()
+            self.export_results(pages=page_count, completed=completed, missing_shards=missing_shards)
+            self.close()
+        return completed
 
 
 # Main execution
 if __name__ == "__main__":
     START_URL = "https://srienlinea.sri.gob.ec/comprobantes-electronicos-internet/pages/consultas/recibidos/comprobantesRecibidos.jsf?&contextoMPT=https://srienlinea.sri.gob.ec/tuportal-internet&pathMPT=Facturaci%F3n%20Electr%F3nica&actualMPT=Comprobantes%20electr%F3nicos%20recibidos%20&linkMPT=%2Fcomprobantes-electronicos-internet%2Fpages%2Fconsultas%2Frecibidos%2FcomprobantesRecibidos.jsf%3F&esFavorito=S"
 
-    downloader = SRIDownloader()
-    downloader.run(START_URL)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Download comprobantes recibidos (XML and PDF) from the SRI portal")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the last unfinished session from its first incomplete row")
+    parser.add_argument("--engine", choices=["browser", "http"], default="browser",
+                        help="click the links in Chrome or replay their requests over HTTP")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="files in flight at once with the http engine")
+    parser.add_argument("--no-cdp", action="store_true",
+                        help="watch the download folder instead of using Chrome DevTools events")
+    parser.add_argument("--batch", action="store_true",
+                        help="run unattended: no prompts, walk every page, retry incomplete pages")
+    parser.add_argument("--max-attempts", type=int, default=3,
+                        help="tries per document, counting backoff retries and the final sweep")
+    parser.add_argument("--login-timeout", type=int, default=900,
+                        help="seconds to wait for the documents table in batch mode")
+    parser.add_argument("--profile-dir",
+                        help="Chrome user data dir, reuse a profile that keeps the SRI session")
+    parser.add_argument("--keep-page-size", action="store_true",
+                        help="do not switch the table to its largest rows-per-page option")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="browsers sharing the login, each downloading its own pages")
+    parser.add_argument("--max-workers", type=int, default=MAX_WORKERS,
+                        help="most browsers ever pointed at the SRI portal at once, --workers is capped to it")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat,
+                        help="first emission date (YYYY-MM-DD), fills in the search form per shard")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat,
+                        help="last emission date (YYYY-MM-DD), defaults to today")
+    parser.add_argument("--shard-by", choices=["month", "day"], default="month",
+                        help="size of each query when a date range is given")
+    parser.add_argument("--max-shard-rows", type=int,
+                        help="split a month shard into days when it finds more documents than this")
+    parser.add_argument("--enumerate", dest="listing_mode", action="store_const", const="enumerate",
+                        help="list every page into the manifest first, then download only what is missing")
+    parser.add_argument("--list-only", dest="listing_mode", action="store_const", const="list-only",
+                        help="only list every page into the manifest, download nothing")
+    parser.add_argument("--report",
+                        help="TXT listing exported with the portal's 'descargar reporte' link, drives downloads by access key")
+    parser.add_argument("--soap", nargs="?", const=AUTORIZACION_URL, metavar="URL",
+                        help="with --report or --enumerate, fetch the XMLs from the SRI autorización web service "
+                             "(optionally at another URL); the browser then only downloads the PDFs")
+    parser.add_argument("--rate", type=float,
+                        help="most portal requests per second, shared by every worker and running process")
+    parser.add_argument("--burst", type=int, default=5,
+                        help="requests allowed back to back before --rate applies")
+    parser.add_argument("--fixed-pacing", action="store_true",
+                        help="keep the original fixed pauses instead of adapting them to the portal's speed")
+    parser.add_argument("--xml-only", action="store_true",
+                        help="download only the XMLs, never click a PDF link")
+    parser.add_argument("--render-ride", action="store_true",
+                        help="at the end, render the RIDE PDF of every XML without one (see ride.py to render on demand)")
+    args = parser.parse_args()
+    if args.resume and (args.workers > 1 or args.date_from):
+        parser.error("--resume continues a single browser walking the listing, it cannot be combined with "
+                     "--workers or --from (re-run those instead: the manifest skips what is already downloaded)")
+    if args.soap and not (args.report or args.listing_mode == "enumerate"):
+        parser.error("--soap needs the access keys from --report or --enumerate")
+
+    downloader = SRIDownloader(use_cdp=not args.no_cdp, engine=args.engine, concurrency=args.concurrency,
+                               interactive=not args.batch, max_attempts=args.max_attempts,
+                               login_timeout=args.login_timeout, profile_dir=args.profile_dir,
+                               maximize_rows=not args.keep_page_size, workers=args.workers,
+                               max_workers=args.max_workers,
+                               date_range=(args.date_from, args.date_to or date.today()) if args.date_from else None,
+                               shard_by=args.shard_by, max_shard_rows=args.max_shard_rows,
+                               listing_mode=args.listing_mode, report_path=args.report, soap_url=args.soap,
+                               xml_only=args.xml_only, render_ride=args.render_ride,
+                               adaptive_pacing=not args.fixed_pacing, rate_limit=args.rate, rate_burst=args.burst)
+    sys.exit(0 if downloader.run(START_URL, resume=args.resume) else 1)
\ No newline at end of file
@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import SRI_Compras_Scrapper_V1 as scrapper
+from manifest import DownloadManifest
+from mock_portal import MockPortal
+
+# Downloader settings of every mode the benchmark can run against the mock portal
+MODES = {
+    "browser": {"use_cdp": True},
+    "watcher": {"use_cdp": False},
+    "http": {"engine": "http"},
+    "http-async": {"engine": "http", "concurrency": 8},
+    "soap": {"listing_mode": "enumerate", "xml_only": True},
+}
+RESULT_PREFIX = "BENCHMARK_RESULT "
+
+
+class HeadlessDownloader(scrapper.SRIDownloader):
+    """SRIDownloader that never shows a browser window"""
+
+    def setup_driver(self, headless=True):
+        super().setup_driver(headless=True)
+
+
+def document_latencies(results_path):
+    """Seconds per downloaded document, as the run wrote them to its NDJSON result stream.
+
+    Every mode reports the same measure there: from the moment the document took a
+    download slot (or the click started) until its last file was saved.
+    """
+    latencies = []
+    try:
+        with open(results_path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record["status"] in ("complete", "partial") and record["seconds"] is not None:
+                    latencies.append(record["seconds"])
+    except FileNotFoundError:
+        pass
+    return latencies
+
+
+def peak_rss_mib():
+    """Peak resident memory of this process (the browser's own processes are not included)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_child(mode, url, soap_url):
+    """Run one mode in this process (HOME points at a scratch folder) and print its result as JSON"""
+    options = dict(MODES[mode], interactive=False, login_timeout=60)
+    if mode == "soap":
+        options["soap_url"] = soap_url
+    downloader = HeadlessDownloader(**options)
+
+    started = time.perf_counter()
+    downloader.run(url)
+    elapsed = time.perf_counter() - started
+    if downloader.driver is None:
+        sys.exit("Chrome could not be started, no result for this mode")
+
+    manifest = DownloadManifest(downloader.base_dir / "manifest.sqlite3")
+    documents = manifest.counts().get("complete", 0)
+    manifest.close()
+    latencies = document_latencies(downloader.results.path)
+    result = {
+        "mode": mode,
+        "documents": documents,
+        "seconds": elapsed,
+        "docs_per_sec": documents / elapsed if elapsed else 0.0,
+        "p50": statistics.median(latencies) if latencies else None,
+        "p95": percentile(latencies, 0.95),
+        "peak_rss_mib": peak_rss_mib(),
+    }
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+def run_mode(mode, portal, work_dir):
+    """Run a mode in a child process with its own output folder; returns its result or None"""
+    home = work_dir / mode
+    home.mkdir(parents=True, exist_ok=True)
+    env = dict(os.environ, HOME=str(home), USERPROFILE=str(home))
+    log_path = work_dir / f"{mode}.log"
+    with open(log_path, "w", encoding="utf-8") as log:
+        process = subprocess.run(
+            [sys.executable, str(Path(__file__).resolve()), "--child", mode,
+             "--url", portal.url, "--soap-url", portal.soap_url],
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding="utf-8",
+        )
+        log.write(process.stdout)
+
+    for line in process.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    print(f"❌ {mode} did not finish, see {log_path}")
+    return None
+
+
+def print_table(results):
+    def ms(value):
+        return f"{value * 1000:8.0f}" if value is not None else "       -"
+
+    print(f"\n{'mode':<12}{'docs':>6}{'secs':>8}{'docs/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'RSS MiB':>9}")
+    for result in results:
+        rss = f"{result['peak_rss_mib']:9.1f}" if result["peak_rss_mib"] is not None else "        -"
+        print(f"{result['mode']:<12}{result['documents']:>6}{result['seconds']:>8.1f}{result['docs_per_sec']:>8.2f}"
+              f"{ms(result['p50'])} {ms(result['p95'])}{rss}")
+
+
+# Benchmark every download mode against the local mock portal:
+#   python benchmark.py --documents 200 --latency 0.1 --error-rate 0.02 --modes http http-async
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the download modes against a local mock of the SRI portal")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--documents", type=int, default=200, help="synthetic documents in the mock listing")
+    parser.add_argument("--page-size", type=int, default=50, help="rows per page the mock starts with")
+    parser.add_argument("--latency", type=float, default=0.05, help="average seconds every mock request takes")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of mock downloads that fail")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    parser.add_argument("--child", choices=list(MODES), help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--soap-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.url, args.soap_url)
+        sys.exit(0)
+
+    portal = MockPortal(documents=args.documents, page_size=args.page_size, latency=args.latency,
+                        error_rate=args.error_rate, seed=1).start()
+    print(f"🧪 Mock portal with {args.documents} documents at {portal.url}")
+    # Each mode's output folder and log are kept for inspection
+    work_dir = Path(tempfile.mkdtemp(prefix="sri_benchmark_"))
+    print(f"📁 Logs and downloads in {work_dir}")
+    results = []
+    try:
+        for mode in args.modes:
+            print(f"⏱️ Running {mode}...")
+            result = run_mode(mode, portal, work_dir)
+            if result:
+                results.append(result)
+    finally:
+        portal.stop()
+        if results:
+            print_table(results)
+        if args.json:
+            Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
@@ -0,0 +1,166 @@
+import threading
+import time
+from pathlib import Path
+
+try:
+    import trio  # installed with selenium, needed for its DevTools connection
+except ImportError:
+    trio = None
+
+
+class CDPDownloadTracker:
+    """Track Chrome downloads through the DevTools Browser.download* events.
+
+    Chrome is told to name every download after its GUID, so each click can be
+    resolved to exactly one file without looking at the download folder.
+    """
+
+    def __init__(self, driver, download_dir, event_buffer=256):
+        self.driver = driver
+        self.download_dir = Path(download_dir)
+        self.event_buffer = event_buffer
+
+        self._downloads = {}  # guid -> {"filename", "state", "received", "total", "path"}
+        self._unclaimed = []  # guids that began and no click has claimed yet
+        self._cond = threading.Condition()
+        self._ready = threading.Event()
+        self._closed = False
+        self._error = None
+        self._thread = None
+        self._trio_token = None
+        self._stop_event = None
+
+    def start(self, timeout=10):
+        """Connect to Chrome DevTools in a background thread and enable download events"""
+        if trio is None:
+            raise RuntimeError("trio is not installed")
+        self._thread = threading.Thread(target=self._run, name="cdp-download-tracker", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError("timed out connecting to Chrome DevTools")
+        if self._error:
+            raise RuntimeError(self._error)
+
+    def _run(self):
+        try:
+            trio.run(self._listen)
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._ready.set()
+            with self._cond:
+                self._closed = True
+                self._cond.notify_all()
+
+    async def _listen(self):
+        async with self.driver.bidi_connection() as connection:
+            session, devtools = connection.session, connection.devtools
+            await session.execute(devtools.browser.set_download_behavior(
+                behavior="allowAndName",
+                download_path=str(self.download_dir),
+                events_enabled=True,
+            ))
+            events = session.listen(devtools.browser.DownloadWillBegin, devtools.browser.DownloadProgress,
+                                    buffer_size=self.event_buffer)
+
+            self._trio_token = trio.lowlevel.current_trio_token()
+            self._stop_event = trio.Event()
+            self._ready.set()
+
+            async with trio.open_nursery() as nursery:
+                nursery.start_soon(self._consume, events, devtools)
+                await self._stop_event.wait()
+                nursery.cancel_scope.cancel()
+
+    async def _consume(self, events, devtools):
+        async for event in events:
+            if isinstance(event, devtools.browser.DownloadWillBegin):
+                self._on_begin(event)
+            elif isinstance(event, devtools.browser.DownloadProgress):
+                self._on_progress(event)
+
+    def _on_begin(self, event):
+        with self._cond:
+            self._downloads[event.guid] = {
+                "filename": event.suggested_filename,
+                "state": "inProgress",
+                "received": 0,
+                "total": 0,
+                "path": None,
+            }
+            self._unclaimed.append(event.guid)
+            self._cond.notify_all()
+
+    def _on_progress(self, event):
+        with self._cond:
+            download = self._downloads.setdefault(event.guid, {"filename": "", "path": None})
+            download["state"] = event.state
+            download["received"] = event.received_bytes
+            download["total"] = event.total_bytes
+            if event.state == "completed":
+                # allowAndName saves the file as <download_dir>/<guid>
+                download["path"] = Path(event.file_path) if event.file_path else self.download_dir / event.guid
+            if event.state != "inProgress":
+                self._cond.notify_all()
+
+    @property
+    def closed(self):
+        """True once the DevTools connection is gone, no more download events will arrive"""
+        return self._closed
+
+    @property
+    def error(self):
+        """What ended the DevTools connection, None when it was stopped on purpose"""
+        return self._error
+
+    def discard_unclaimed(self):
+        """Forget downloads nobody claimed, call this right before clicking a link"""
+        with self._cond:
+            self._unclaimed.clear()
+
+    def claim_next(self, timeout=10):
+        """Return the GUID of the next download that begins, or None if none started"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._unclaimed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._closed:
+                    return None
+                self._cond.wait(remaining)
+            return self._unclaimed.pop(0)
+
+    def wait(self, guid, timeout=15):
+        """Wait for a download to finish.
+
+        Returns its final Path, renamed to carry the extension of the filename
+        Chrome suggested, or False if it was cancelled or timed out.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                download = self._downloads.get(guid, {})
+                state = download.get("state")
+                if state == "completed":
+                    break
+                remaining = deadline - time.monotonic()
+                if state == "canceled" or remaining <= 0 or self._closed:
+                    self._downloads.pop(guid, None)
+                    return False
+                self._cond.wait(remaining)
+            self._downloads.pop(guid, None)
+
+        path = download["path"]
+        suffix = Path(download["filename"]).suffix.lower()
+        if suffix and path.suffix.lower() != suffix:
+            named_path = path.with_name(path.name + suffix)
+            path.rename(named_path)
+            path = named_path
+        return path
+
+    def stop(self):
+        if self._trio_token is not None and self._thread.is_alive():
+            try:
+                trio.from_thread.run_sync(self._stop_event.set, trio_token=self._trio_token)
+            except trio.RunFinishedError:
+                pass
+            self._thread.join(timeout=5)
@@ -0,0 +1,122 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+# inotify constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_CLOEXEC = 0o2000000
+
+# struct inotify_event header: wd, mask, cookie, len (name follows, NUL padded)
+EVENT_HEADER = struct.Struct("iIII")
+
+# Names Chrome uses while a download is still being written
+PARTIAL_SUFFIXES = (".crdownload", ".tmp")
+
+
+class DownloadWatcher:
+    """Wait for finished downloads in a directory (inotify on Linux, polling elsewhere)"""
+
+    def __init__(self, directory, poll_interval=0.25):
+        self.directory = Path(directory)
+        self.poll_interval = poll_interval
+        self._fd = None
+        self._finished = []  # file names reported by inotify, oldest first
+        self._start_inotify()
+
+    @property
+    def uses_inotify(self):
+        return self._fd is not None
+
+    def _start_inotify(self):
+        """Open an inotify watch on the download directory if the platform supports it"""
+        if not sys.platform.startswith("linux"):
+            return
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            wd = libc.inotify_add_watch(fd, os.fsencode(str(self.directory)), IN_MOVED_TO | IN_CLOSE_WRITE)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                os.close(fd)
+                raise OSError(errno, f"inotify_add_watch failed for {self.directory}")
+            self._fd = fd
+        except (OSError, AttributeError) as e:
+            print(f"⚠️ inotify not available, using polling for downloads: {e}")
+
+    def _read_events(self):
+        """Drain the inotify queue and remember every file that finished"""
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            if not data:
+                return
+
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                _, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + name_len].rstrip(b"\0").decode(errors="replace")
+                offset += name_len
+
+                if mask & IN_Q_OVERFLOW:
+                    print("  ⚠️ inotify queue overflow, some download events were lost")
+                    continue
+                if not name or name.lower().endswith(PARTIAL_SUFFIXES):
+                    continue
+                # Chrome renames the final file into place; a direct write only reports the close
+                if name not in self._finished:
+                    self._finished.append(name)
+
+    def discard_pending(self):
+        """Forget events seen so far, call this right before triggering a new download"""
+        if self._fd is not None:
+            self._read_events()
+        self._finished.clear()
+
+    def wait(self, timeout=15):
+        """Wait for the next finished download.
+
+        Returns the Path of the finished file, True when polling can only tell that
+        nothing is downloading anymore, or False on timeout.
+        """
+        if self._fd is None:
+            return self._poll(timeout)
+
+        deadline = time.monotonic() + timeout
+        while True:
+            if self._finished:
+                return self.directory / self._finished.pop(0)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            ready, _, _ = select.select([self._fd], [], [], remaining)
+            if ready:
+                self._read_events()
+
+    def _poll(self, timeout):
+        """Fallback: wait until Chrome has no .crdownload files left"""
+        start_time = time.time()
+        while time.time() - start_time < timeout:
+            # Check for .crdownload files (Chrome's temporary download files)
+            downloading = list(self.directory.glob("*.crdownload"))
+            if not downloading:
+                time.sleep(0.015)  # Small buffer to ensure file is fully written
+                return True
+            time.sleep(self.poll_interval)
+        return False
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,111 @@
+import re
+from urllib.parse import unquote, urlencode
+
+import urllib3  # installed with selenium
+
+FORM_ID = "frmPrincipal"
+LINK_ID = FORM_ID + ":tablaCompRecibidos:{index}:{link}"
+LINKS = {"XML": "lnkXml", "PDF": "lnkPdf"}
+DEFAULT_SUFFIX = {"XML": ".xml", "PDF": ".pdf"}
+
+# Everything the browser would post when frmPrincipal is submitted, plus what we need to look like it
+EXPORT_FORM_SCRIPT = """
+var form = document.getElementById(arguments[0]);
+if (!form) { return null; }
+var fields = [];
+for (var i = 0; i < form.elements.length; i++) {
+    var el = form.elements[i];
+    var type = (el.type || '').toLowerCase();
+    if (!el.name || el.disabled) { continue; }
+    if (['submit', 'button', 'image', 'reset', 'file'].indexOf(type) >= 0) { continue; }
+    if ((type === 'checkbox' || type === 'radio') && !el.checked) { continue; }
+    if (el.tagName === 'SELECT' && el.multiple) {
+        for (var j = 0; j < el.options.length; j++) {
+            if (el.options[j].selected) { fields.push([el.name, el.options[j].value]); }
+        }
+        continue;
+    }
+    fields.push([el.name, el.value]);
+}
+return {action: form.action, fields: fields, userAgent: navigator.userAgent, referer: window.location.href};
+"""
+
+
+class HTTPDownloadEngine:
+    """Download documents by replaying the JSF postbacks of the lnkXml / lnkPdf links.
+
+    Uses the cookies and javax.faces.ViewState of a logged in browser session and a
+    pooled keep-alive HTTP client, so no click, browser download or file move is needed.
+    """
+
+    def __init__(self, action_url, fields, cookies, user_agent=None, referer=None,
+                 pool_size=4, timeout=30, retries=2):
+        self.action_url = action_url
+        self.fields = [tuple(field) for field in fields]
+        self.headers = {
+            "Cookie": "; ".join(f"{c['name']}={c['value']}" for c in cookies),
+            "Content-Type": "application/x-www-form-urlencoded",
+        }
+        if user_agent:
+            self.headers["User-Agent"] = user_agent
+        if referer:
+            self.headers["Referer"] = referer
+
+        self.http = urllib3.PoolManager(
+            maxsize=pool_size,
+            block=True,  # never open more than pool_size connections to the portal
+            timeout=urllib3.Timeout(connect=10, read=timeout),
+            retries=urllib3.Retry(total=retries, backoff_factor=0.5, allowed_methods=None,
+                                  status_forcelist=(502, 503, 504)),
+        )
+
+    @classmethod
+    def from_driver(cls, driver, form_id=FORM_ID, **kwargs):
+        """Export the session cookies and JSF form state from a Selenium driver"""
+        state = driver.execute_script(EXPORT_FORM_SCRIPT, form_id)
+        if not state:
+            raise RuntimeError(f"Form {form_id} not found, is the documents page open?")
+        if not any(name == "javax.faces.ViewState" for name, _ in state["fields"]):
+            raise RuntimeError("javax.faces.ViewState not found in the form")
+        return cls(state["action"], state["fields"], driver.get_cookies(),
+                   user_agent=state["userAgent"], referer=state["referer"], **kwargs)
+
+    def refresh_from_driver(self, driver, form_id=FORM_ID):
+        """Pick up a new ViewState and cookies after the browser changed the view (e.g. paging)"""
+        fresh = self.from_driver(driver, form_id)
+        self.action_url = fresh.action_url
+        self.fields = fresh.fields
+        self.headers.update(fresh.headers)
+        fresh.close()
+
+    def fetch(self, index, file_type):
+        """Download one document file; returns (filename, bytes)"""
+        link_id = LINK_ID.format(index=index, link=LINKS[file_type])
+        body = urlencode(self.fields + [(link_id, link_id)])
+        response = self.http.request("POST", self.action_url, body=body, headers=self.headers)
+
+        if response.status != 200:
+            raise RuntimeError(f"HTTP {response.status} downloading {file_type} {index}")
+
+        disposition = response.headers.get("Content-Disposition", "")
+        content_type = response.headers.get("Content-Type", "")
+        if "attachment" not in disposition.lower() and "text/html" in content_type.lower():
+            # JSF answered with a page: the session expired or the view state is stale
+            raise RuntimeError(f"Got a page instead of the {file_type} file, session or view state expired")
+
+        filename = parse_filename(disposition) or f"documento_{index}{DEFAULT_SUFFIX[file_type]}"
+        return filename, response.data
+
+    def close(self):
+        self.http.clear()
+
+
+def parse_filename(disposition):
+    """Extract the file name from a Content-Disposition header"""
+    match = re.search(r"filename\*\s*=\s*[^']*''([^;]+)", disposition, re.IGNORECASE)
+    if match:
+        return unquote(match.group(1).strip())
+    match = re.search(r'filename\s*=\s*"?([^";]+)"?', disposition, re.IGNORECASE)
+    if match:
+        return match.group(1).strip()
+    return None
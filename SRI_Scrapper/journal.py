@@ -0,0 +1,108 @@
+import json
+import os
+import time
+from pathlib import Path
+
+FILE_TYPES = ("XML", "PDF")
+
+
+class SessionJournal:
+    """Crash-safe record of a download session's position, rewritten after every document.
+
+    Completed pages only keep a marker, so the file stays small for long sessions.
+    """
+
+    def __init__(self, path, state=None, required=FILE_TYPES):
+        self.path = Path(path)
+        self.required = tuple(required)  # file types a row needs to be done, ("XML",) in XML-only mode
+        self.scope = None  # set per date shard, so page numbers of different queries don't mix
+        self.state = state or {
+            "session_id": time.strftime("%Y%m%d_%H%M%S"),
+            "finished": False,
+            "current_page": 1,
+            "current_index": None,
+            "pages": {},  # "page" -> {"indices": [...], "documents": {"index": {"XML": "ok", ...}}, "complete": bool}
+        }
+
+    @classmethod
+    def load(cls, path, required=FILE_TYPES):
+        """Return the journal saved at path, or None if there is none"""
+        try:
+            return cls(path, json.loads(Path(path).read_text(encoding="utf-8")), required)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read session journal {path}: {e}")
+            return None
+
+    def save(self):
+        """Write the journal atomically, so a crash never leaves a half written file"""
+        self.state["updated_at"] = time.time()
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _key(self, page):
+        return str(page) if self.scope is None else f"{self.scope}/{page}"
+
+    def _page(self, page):
+        return self.state["pages"].setdefault(self._key(page), {"indices": [], "documents": {}, "complete": False})
+
+    def start_page(self, page, indices):
+        entry = self._page(page)
+        entry["indices"] = list(indices)
+        self.state["current_page"] = page
+        self.state["current_index"] = None
+        self.save()
+
+    def record_document(self, page, index, statuses):
+        """Merge per-file statuses ('ok' / 'failed') for one row and save"""
+        entry = self._page(page)
+        document = entry["documents"].setdefault(str(index), {})
+        for file_type, status in statuses.items():
+            if document.get(file_type) != "ok":
+                document[file_type] = status
+        self.state["current_page"] = page
+        self.state["current_index"] = index
+        self.save()
+
+    def is_document_done(self, page, index):
+        entry = self.state["pages"].get(self._key(page))
+        if not entry:
+            return False
+        if entry["complete"]:
+            return True
+        document = entry["documents"].get(str(index), {})
+        return all(document.get(file_type) == "ok" for file_type in self.required)
+
+    def is_page_started(self, page):
+        """True once a row of the page was recorded (or the page is complete)"""
+        entry = self.state["pages"].get(self._key(page))
+        return bool(entry and (entry["complete"] or entry["documents"]))
+
+    def is_page_complete(self, page):
+        entry = self.state["pages"].get(self._key(page))
+        return bool(entry and entry["complete"])
+
+    def complete_page_if_done(self, page):
+        """Mark the page complete when every row has its required files, dropping its per-row detail"""
+        entry = self._page(page)
+        if entry["indices"] and all(self.is_document_done(page, index) for index in entry["indices"]):
+            entry.update(complete=True, documents={})
+        self.save()
+        return entry["complete"]
+
+    def resume_page(self):
+        """First page that still has unfinished rows, or the page after the last complete one"""
+        pages = sorted(int(page) for page in self.state["pages"] if page.isdigit())
+        for page in pages:
+            if not self.state["pages"][str(page)]["complete"]:
+                return page
+        return pages[-1] + 1 if pages else 1
+
+    def finish(self):
+        self.state["finished"] = True
+        self.save()
@@ -0,0 +1,247 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS comprobantes (
+    key TEXT PRIMARY KEY,
+    clave_acceso TEXT,
+    factura TEXT,
+    ruc TEXT,
+    emisor TEXT,
+    fecha TEXT,
+    status TEXT NOT NULL DEFAULT 'listed',
+    xml_path TEXT,
+    xml_size INTEGER,
+    xml_sha256 TEXT,
+    pdf_path TEXT,
+    pdf_size INTEGER,
+    pdf_sha256 TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_comprobantes_status ON comprobantes (status);
+"""
+
+# Columns added after the first release, created on open when an older manifest lacks them
+MIGRATIONS = {
+    "listed_in": "ALTER TABLE comprobantes ADD COLUMN listed_in TEXT",  # session that last listed the row
+    "page": "ALTER TABLE comprobantes ADD COLUMN page INTEGER",
+    "row_index": "ALTER TABLE comprobantes ADD COLUMN row_index INTEGER",
+    "attempts": "ALTER TABLE comprobantes ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0",  # failed tries
+}
+
+# Metadata columns copied from a page snapshot record
+ROW_COLUMNS = ("clave_acceso", "factura", "ruc", "emisor", "fecha")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DownloadManifest:
+    """SQLite record of every comprobante already downloaded, so re-runs only fetch new ones.
+
+    Documents are keyed by clave de acceso, or by invoice number plus RUC when the
+    listing does not show the key. Status is 'listed', 'partial', 'complete' or 'failed';
+    a document is complete once it has every `required` file type (just the XML in XML-only mode).
+    """
+
+    def __init__(self, path, required=("XML", "PDF")):
+        self.path = Path(path)
+        self.required = tuple(file_type.lower() for file_type in required)
+        # Rows of a listing still missing a required file
+        self.missing_sql = "(" + " OR ".join(f"{prefix}_path IS NULL" for prefix in self.required) + ")"
+        # One connection shared by the download threads, serialized by the lock
+        # (other pool workers open their own connection, so wait for their writes)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+            columns = {column[1] for column in self.conn.execute("PRAGMA table_info(comprobantes)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    self.conn.execute(statement)
+
+    @staticmethod
+    def key_for(row):
+        if row.get("clave_acceso"):
+            return row["clave_acceso"]
+        return f"{row.get('factura', '')}|{row.get('ruc', '')}"
+
+    def get(self, row):
+        with self.lock:
+            return self.conn.execute("SELECT * FROM comprobantes WHERE key = ?", (self.key_for(row),)).fetchone()
+
+    def is_complete(self, row):
+        """True when every required file was downloaded and is still on disk"""
+        entry = self.get(row)
+        if entry is None:
+            return False
+        return all(entry[f"{prefix}_path"] and Path(entry[f"{prefix}_path"]).exists() for prefix in self.required)
+
+    def saved_types(self, row):
+        """File types ("XML", "PDF") of a document that are already downloaded and still on disk"""
+        entry = self.get(row)
+        if entry is None:
+            return set()
+        return {file_type for file_type in ("XML", "PDF")
+                if entry[f"{file_type.lower()}_path"] and Path(entry[f"{file_type.lower()}_path"]).exists()}
+
+    def record_row(self, row, status="listed"):
+        """Insert or refresh a document's metadata without touching its file columns"""
+        values = [row.get(column, "") for column in ROW_COLUMNS]
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"""INSERT INTO comprobantes (key, {", ".join(ROW_COLUMNS)}, status, updated_at)
+                    VALUES (?, {", ".join("?" for _ in ROW_COLUMNS)}, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        {", ".join(f"{c} = COALESCE(NULLIF(excluded.{c}, ''), {c})" for c in ROW_COLUMNS)},
+                        updated_at = excluded.updated_at""",
+                [self.key_for(row), *values, status, time.time()],
+            )
+
+    def record_listing(self, rows, page, listing_id):
+        """Record a whole page of the listing and where each row sits, in one transaction"""
+        columns = (*ROW_COLUMNS, "listed_in", "page", "row_index")
+        params = [
+            [self.key_for(row), *(row.get(column, "") for column in ROW_COLUMNS), listing_id, page, row["index"],
+             time.time()]
+            for row in rows
+        ]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                f"""INSERT INTO comprobantes (key, {", ".join(columns)}, updated_at)
+                    VALUES (?, {", ".join("?" for _ in columns)}, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        {", ".join(f"{c} = COALESCE(NULLIF(excluded.{c}, ''), {c})" for c in ROW_COLUMNS)},
+                        listed_in = excluded.listed_in, page = excluded.page, row_index = excluded.row_index,
+                        updated_at = excluded.updated_at""",
+                params,
+            )
+
+    def pending_pages(self, listing_id):
+        """{page: documents still to download} for the rows a listing pass recorded"""
+        with self.lock:
+            return dict(self.conn.execute(
+                f"""SELECT page, COUNT(*) FROM comprobantes
+                   WHERE listed_in = ? AND {self.missing_sql}
+                   GROUP BY page ORDER BY page""",
+                (listing_id,),
+            ).fetchall())
+
+    def count_pending(self, listing_id):
+        """Number of documents a listing recorded that are not downloaded yet"""
+        with self.lock:
+            return self.conn.execute(
+                f"SELECT COUNT(*) FROM comprobantes WHERE listed_in = ? AND {self.missing_sql}",
+                (listing_id,)).fetchone()[0]
+
+    def pending_among(self, listing_id, keys):
+        """The given keys (e.g. the rows of one page) a listing recorded and that are not downloaded yet"""
+        keys = list(keys)
+        pending = set()
+        with self.lock:
+            # Stay under SQLite's limit of bound parameters per statement
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                pending.update(key for (key,) in self.conn.execute(
+                    f"""SELECT key FROM comprobantes
+                        WHERE listed_in = ? AND {self.missing_sql} AND key IN ({", ".join("?" for _ in chunk)})""",
+                    (listing_id, *chunk)))
+        return pending
+
+    def missing_rows(self, listing_id, file_type):
+        """Rows of a listing that have an access key but no file of the given type yet"""
+        with self.lock:
+            return [dict(entry) for entry in self.conn.execute(
+                f"""SELECT key, {", ".join(ROW_COLUMNS)} FROM comprobantes
+                    WHERE listed_in = ? AND status != 'complete' AND COALESCE(clave_acceso, '') != ''
+                          AND {file_type.lower()}_path IS NULL""",
+                (listing_id,))]
+
+    def unrendered_rows(self):
+        """Documents with an XML on disk but no PDF, e.g. downloaded in XML-only mode"""
+        with self.lock:
+            return [dict(entry) for entry in self.conn.execute(
+                f"""SELECT key, {", ".join(ROW_COLUMNS)}, xml_path FROM comprobantes
+                    WHERE xml_path IS NOT NULL AND pdf_path IS NULL""")]
+
+    def record_file(self, row, file_type, path):
+        """Store the path, size and hash of a downloaded XML or PDF and update the status"""
+        prefix = file_type.lower()
+        path = Path(path)
+        size = path.stat().st_size
+        sha256 = file_sha256(path)
+
+        # Complete once the other required files are already recorded
+        others = [f"{other}_path IS NOT NULL" for other in self.required if other != prefix]
+        complete = " AND ".join(others) if others else "1"
+
+        self.record_row(row)
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"""UPDATE comprobantes
+                    SET {prefix}_path = ?, {prefix}_size = ?, {prefix}_sha256 = ?, updated_at = ?,
+                        status = CASE WHEN {complete} THEN 'complete' ELSE 'partial' END
+                    WHERE key = ?""",
+                (str(path), size, sha256, time.time(), self.key_for(row)),
+            )
+
+    def mark_failed(self, row):
+        """Flag a document whose downloads all failed, unless some file was already saved"""
+        self.record_row(row, status="failed")
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE comprobantes SET status = 'failed' WHERE key = ? AND status = 'listed'",
+                (self.key_for(row),),
+            )
+
+    def record_attempt(self, row):
+        """Count a try that left the document incomplete"""
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE comprobantes SET attempts = attempts + 1, updated_at = ? WHERE key = ?",
+                              (time.time(), self.key_for(row)))
+
+    def counts(self):
+        with self.lock:
+            return dict(self.conn.execute("SELECT status, COUNT(*) FROM comprobantes GROUP BY status").fetchall())
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class PendingKeys:
+    """The documents of a listing still to download, looked up in the manifest one page at a time.
+
+    Works as the `only_keys` of SRIDownloader.iter_page() without holding every key of
+    a large report in memory: intersection() asks the manifest about a page's keys and
+    only a count of the documents not found yet is kept.
+    """
+
+    def __init__(self, manifest, listing_id):
+        self.manifest = manifest
+        self.listing_id = listing_id
+        self.remaining = manifest.count_pending(listing_id)
+        self.checked = 0  # keys looked up so far
+        self.access_keys = 0  # of which are access keys, a listing without any can never match
+
+    def __len__(self):
+        return self.remaining
+
+    def intersection(self, keys):
+        """The keys still to download among `keys`; they count as found from now on"""
+        keys = list(keys)
+        self.checked += len(keys)
+        self.access_keys += sum(1 for key in keys if len(key) == 49 and key.isdigit())
+        found = self.manifest.pending_among(self.listing_id, keys)
+        self.remaining = max(0, self.remaining - len(found))
+        return found
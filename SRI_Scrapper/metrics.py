@@ -0,0 +1,114 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Histogram bucket upper bounds in seconds, from a quick script call to a stuck download
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """Count, sum, max and cumulative bucket counts of one stage's durations"""
+    __slots__ = ("count", "sum", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+    def quantile(self, q):
+        """Estimate a quantile from the buckets (upper bound of the bucket it falls in)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, cumulative in zip(BUCKETS, self.buckets):
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else None,
+            "max": round(self.max, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": {str(bound): cumulative for bound, cumulative in zip(BUCKETS, self.buckets)},
+        }
+
+
+class StageMetrics:
+    """Time spent in each stage of the download loop, shared by every thread and pool worker.
+
+    Stages: locate, click, download_wait, move, page_navigation, plus http_request,
+    soap_request and document (one whole row) where those paths run.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "started": self.started,
+                "finished": time.time(),
+                "stages": {stage: histogram.to_dict() for stage, histogram in sorted(self.histograms.items())},
+            }
+
+    def to_prometheus(self):
+        """The histograms in the Prometheus text exposition format"""
+        lines = [
+            "# HELP sri_stage_seconds Time spent in each stage of the SRI download loop.",
+            "# TYPE sri_stage_seconds histogram",
+        ]
+        with self.lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                for bound, cumulative in zip(BUCKETS, histogram.buckets):
+                    lines.append(f'sri_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'sri_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'sri_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'sri_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_path, prometheus_path):
+        """Write both exports, each through a temporary file so readers never see half a file"""
+        for path, text in ((json_path, json.dumps(self.to_dict(), indent=2)),
+                           (prometheus_path, self.to_prometheus())):
+            path = Path(path)
+            tmp_path = path.with_name(path.name + ".tmp")
+            tmp_path.write_text(text, encoding="utf-8")
+            tmp_path.replace(path)
+
+    def summary(self):
+        """One line per stage: count, total and mean time"""
+        with self.lock:
+            return [f"{stage}: {h.count}× {h.sum:.1f}s total, {h.sum / h.count * 1000:.0f} ms mean"
+                    for stage, h in sorted(self.histograms.items(), key=lambda item: -item[1].sum)]
@@ -0,0 +1,370 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import date, timedelta
+from functools import lru_cache
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from ride import parse_document, render_ride
+
+# Same path as the real portal, so the downloader's URL checks and referers look alike
+PAGE_PATH = "/comprobantes-electronicos-internet/pages/consultas/recibidos/comprobantesRecibidos.jsf"
+SOAP_PATH = "/comprobantes-electronicos-ws/AutorizacionComprobantesOffline"
+ROWS_PER_PAGE_OPTIONS = (10, 20, 50, 75)
+LINK_PATTERN = re.compile(r"^frmPrincipal:tablaCompRecibidos:(\d+):(lnkXml|lnkPdf)$")
+
+# Just enough of PrimeFaces for the downloader: the AJAX queue and the datatable paginator widget
+PAGE_SCRIPT = """
+var mockQueue = 0;
+window.PrimeFaces = {ajax: {Queue: {isEmpty: function () { return mockQueue === 0; }}}, widgets: {}};
+function mockLoad(page, rows) {
+    var form = document.getElementById('frmPrincipal');
+    var xhr = new XMLHttpRequest();
+    mockQueue++;
+    xhr.open('POST', form.action);
+    xhr.setRequestHeader('Content-Type', 'application/x-www-form-urlencoded');
+    xhr.setRequestHeader('Faces-Request', 'partial/ajax');
+    xhr.onload = function () {
+        if (xhr.status === 200) {
+            var data = JSON.parse(xhr.responseText);
+            document.getElementById('frmPrincipal:tablaCompRecibidos').innerHTML = data.table;
+            mockPaginator(data.page, data.pages, data.rowCount, data.rows);
+        }
+        mockQueue--;
+    };
+    xhr.onerror = function () { mockQueue--; };
+    xhr.send('javax.faces.partial.ajax=true&javax.faces.ViewState='
+        + encodeURIComponent(form.elements['javax.faces.ViewState'].value) + '&page=' + page + '&rows=' + rows);
+}
+function mockPaginator(page, pages, rowCount, rows) {
+    PrimeFaces.widgets.tablaCompRecibidos = {
+        id: 'frmPrincipal:tablaCompRecibidos',
+        paginator: {
+            cfg: {pageCount: pages, rowCount: rowCount, rows: rows},
+            getCurrentPage: function () { return page; },
+            setPage: function (p) { if (p >= 0 && p < pages && p !== page) { mockLoad(p, rows); } }
+        },
+        getPaginator: function () { return this.paginator; }
+    };
+}
+function mockNext() { var p = PrimeFaces.widgets.tablaCompRecibidos.paginator; p.setPage(p.getCurrentPage() + 1); }
+function mockRows(rows) { mockLoad(0, parseInt(rows, 10)); }
+function mockDownload(linkId) {
+    // Like a JSF command link: post the whole form with the link's id as a parameter
+    var form = document.getElementById('frmPrincipal');
+    var input = document.createElement('input');
+    input.type = 'hidden'; input.name = linkId; input.value = linkId;
+    form.appendChild(input);
+    form.submit();
+    form.removeChild(input);
+    return false;
+}
+"""
+
+
+def check_digit(digits):
+    """Módulo 11 check digit of a clave de acceso"""
+    total = sum(int(digit) * (2 + i % 6) for i, digit in enumerate(reversed(digits)))
+    digit = 11 - total % 11
+    return {11: 0, 10: 1}.get(digit, digit)
+
+
+class MockDocument:
+    """One synthetic comprobante of the mock listing"""
+    __slots__ = ("number", "emitted", "ruc", "emisor", "serie", "clave_acceso", "total")
+
+    def __init__(self, number, emitted):
+        self.number = number
+        self.emitted = emitted
+        self.ruc = f"179{number % 1000:07d}001"
+        self.emisor = f"PROVEEDOR {number % 1000:03d} S.A."
+        self.serie = f"001-{1 + number % 3:03d}-{number + 1:09d}"
+        digits = (f"{emitted:%d%m%Y}01{self.ruc}2{self.serie[:3]}{self.serie[4:7]}{number + 1:09d}"
+                  f"{number * 7919 % 10 ** 8:08d}1")
+        self.clave_acceso = digits + str(check_digit(digits))
+        self.total = f"{(number * 37 % 5000) + 1.15:.2f}"
+
+
+class MockPortal:
+    """Local stand-in for the comprobantes recibidos page of the SRI portal.
+
+    Serves a PrimeFaces-like listing of synthetic documents: a search form, a paginated
+    table whose lnkXml / lnkPdf postbacks return the XML and RIDE PDF, and the
+    autorización SOAP service. Every request waits about `latency` seconds and
+    downloads fail with probability `error_rate`.
+    """
+
+    def __init__(self, documents=500, page_size=50, latency=0.05, error_rate=0.0, year=2024,
+                 host="127.0.0.1", port=0, seed=None):
+        self.page_size = page_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.year = year
+        self.random = random.Random(seed)
+        start = date(year, 1, 1)
+        self.documents = [MockDocument(n, start + timedelta(days=n * 365 // max(documents, 1)))
+                          for n in range(documents)]
+        self.by_clave = {document.clave_acceso: document for document in self.documents}
+        self.server = ThreadingHTTPServer((host, port), MockPortalHandler)
+        self.server.daemon_threads = True
+        self.server.portal = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{PAGE_PATH}"
+
+    @property
+    def soap_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{SOAP_PATH}"
+
+    def start(self):
+        """Serve from a background thread; returns self"""
+        self.thread = threading.Thread(target=self.server.serve_forever, name="mock-portal", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def delay(self):
+        if self.latency:
+            time.sleep(self.latency * self.random.uniform(0.5, 1.5))
+
+    def fails(self):
+        return self.error_rate and self.random.random() < self.error_rate
+
+    def query(self, ano, mes, dia):
+        """Documents of a search: mes 0 is the whole year, dia 0 the whole month"""
+        return [document for document in self.documents
+                if document.emitted.year == ano and (not mes or document.emitted.month == mes)
+                and (not dia or document.emitted.day == dia)]
+
+    @staticmethod
+    def view_state(ano, mes, dia):
+        # The real ViewState is opaque; here it simply carries the search, like the server-side view would
+        return f"{ano}:{mes}:{dia}"
+
+    @staticmethod
+    def parse_view_state(value):
+        ano, mes, dia = (int(part) for part in value.split(":"))
+        return ano, mes, dia
+
+    def table_html(self, documents, page, rows):
+        pages = max(1, -(-len(documents) // rows))
+        first = page * rows
+        body = []
+        for index, document in enumerate(documents[first:first + rows], first):
+            links = "".join(
+                f'<td><a id="frmPrincipal:tablaCompRecibidos:{index}:{link}" href="#" '
+                f'onclick="return mockDownload(this.id)">{label}</a></td>'
+                for link, label in (("lnkXml", "XML"), ("lnkPdf", "PDF")))
+            body.append(
+                f"<tr data-ri=\"{index}\"><td>{index + 1}</td>"
+                f"<td>{document.ruc} - {escape(document.emisor)}</td>"
+                f"<td>Factura {document.serie}</td><td>{document.clave_acceso}</td>"
+                f"<td>{document.emitted:%d/%m/%Y} 10:00:00</td><td>{document.emitted:%d/%m/%Y}</td>"
+                f"<td>{document.total}</td>{links}</tr>")
+        if not documents:
+            body.append('<tr class="ui-datatable-empty-message"><td colspan="10">No existen datos</td></tr>')
+
+        window = range(max(0, page - 4), min(pages, page + 5))
+        page_links = "".join(
+            f'<span class="ui-paginator-page ui-state-default{" ui-state-active" if p == page else ""}" '
+            f'onclick="PrimeFaces.widgets.tablaCompRecibidos.paginator.setPage({p})">{p + 1}</span>'
+            for p in window)
+        options = "".join(f'<option value="{n}"{" selected" if n == rows else ""}>{n}</option>'
+                          for n in ROWS_PER_PAGE_OPTIONS)
+        next_state = " ui-state-disabled" if page >= pages - 1 else ""
+        return (f'<div class="ui-paginator ui-paginator-top">'
+                f'<span class="ui-paginator-pages">{page_links}</span>'
+                f'<span class="ui-paginator-next ui-state-default{next_state}" onclick="mockNext()">&gt;</span>'
+                f'<select class="ui-paginator-rpp-options" onchange="mockRows(this.value)">{options}</select></div>'
+                f'<table><tbody id="frmPrincipal:tablaCompRecibidos_data">{"".join(body)}</tbody></table>')
+
+    def page_html(self, ano, mes, dia):
+        documents = self.query(ano, mes, dia)
+        pages = max(1, -(-len(documents) // self.page_size))
+
+        def select(name, values, selected):
+            options = "".join(f'<option value="{v}"{" selected" if v == selected else ""}>{v}</option>'
+                              for v in values)
+            return f'<select id="frmPrincipal:{name}" name="frmPrincipal:{name}">{options}</select>'
+
+        return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Comprobantes electrónicos recibidos</title>
+<script>{PAGE_SCRIPT}</script></head>
+<body onload="mockPaginator(0, {pages}, {len(documents)}, {self.page_size})">
+<form id="frmPrincipal" name="frmPrincipal" method="post" action="{PAGE_PATH}" enctype="application/x-www-form-urlencoded">
+<input type="hidden" name="frmPrincipal" value="frmPrincipal">
+{select("ano", range(self.year - 1, self.year + 2), ano)}
+{select("mes", range(0, 13), mes)}
+{select("dia", range(0, 32), dia)}
+<button id="frmPrincipal:btnConsultar" name="frmPrincipal:btnConsultar" type="submit" value="Consultar">Consultar</button>
+<div id="frmPrincipal:tablaCompRecibidos" class="ui-datatable">{self.table_html(documents, 0, self.page_size)}</div>
+<input type="hidden" name="javax.faces.ViewState" id="j_id1:javax.faces.ViewState:0" value="{self.view_state(ano, mes, dia)}">
+</form></body></html>"""
+
+    @lru_cache(maxsize=1024)
+    def document_xml(self, number):
+        document = self.documents[number]
+        comprobante = f"""<?xml version="1.0" encoding="UTF-8"?>
+<factura id="comprobante" version="1.1.0"><infoTributaria><ambiente>2</ambiente><tipoEmision>1</tipoEmision>
+<razonSocial>{escape(document.emisor)}</razonSocial><ruc>{document.ruc}</ruc><claveAcceso>{document.clave_acceso}</claveAcceso>
+<codDoc>01</codDoc><estab>{document.serie[:3]}</estab><ptoEmi>{document.serie[4:7]}</ptoEmi><secuencial>{document.serie[8:]}</secuencial>
+<dirMatriz>Av. Amazonas N{document.number % 100}-12, Quito</dirMatriz></infoTributaria>
+<infoFactura><fechaEmision>{document.emitted:%d/%m/%Y}</fechaEmision><razonSocialComprador>CLIENTE DE PRUEBA</razonSocialComprador>
+<identificacionComprador>1790000000001</identificacionComprador><totalSinImpuestos>{document.total}</totalSinImpuestos>
+<totalDescuento>0.00</totalDescuento><importeTotal>{document.total}</importeTotal><moneda>DOLAR</moneda></infoFactura>
+<detalles><detalle><codigoPrincipal>SRV-{document.number}</codigoPrincipal><descripcion>Servicio de prueba</descripcion>
+<cantidad>1</cantidad><precioUnitario>{document.total}</precioUnitario><descuento>0</descuento>
+<precioTotalSinImpuesto>{document.total}</precioTotalSinImpuesto></detalle></detalles></factura>"""
+        return f"""<?xml version="1.0" encoding="UTF-8"?>
+<autorizacion>
+  <estado>AUTORIZADO</estado>
+  <numeroAutorizacion>{document.clave_acceso}</numeroAutorizacion>
+  <fechaAutorizacion>{document.emitted:%Y-%m-%d}T10:00:00-05:00</fechaAutorizacion>
+  <ambiente>PRODUCCIÓN</ambiente>
+  <comprobante><![CDATA[{comprobante}]]></comprobante>
+  <mensajes/>
+</autorizacion>""".encode("utf-8")
+
+    @lru_cache(maxsize=1024)
+    def document_pdf(self, number):
+        return render_ride(parse_document(self.document_xml(number)))
+
+
+class MockPortalHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def portal(self):
+        return self.server.portal
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, data, content_type="text/html; charset=utf-8", headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.portal.delay()
+        if urlsplit(self.path).path != PAGE_PATH:
+            self.send(404, b"Not found")
+            return
+        # The first visit shows the whole year, as if the user had already searched
+        html = self.portal.page_html(self.portal.year, 0, 0)
+        self.send(200, html.encode("utf-8"), headers=[("Set-Cookie", "JSESSIONID=mock; Path=/")])
+
+    def do_POST(self):
+        self.portal.delay()
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8", "replace")
+        path = urlsplit(self.path).path
+        if path == SOAP_PATH:
+            self.soap(body)
+            return
+        if path != PAGE_PATH:
+            self.send(404, b"Not found")
+            return
+
+        form = {name: values[-1] for name, values in parse_qs(body, keep_blank_values=True).items()}
+        try:
+            ano, mes, dia = self.portal.parse_view_state(form.get("javax.faces.ViewState", ""))
+        except ValueError:
+            self.send(200, b"<html><body>La sesi\xc3\xb3n ha expirado</body></html>")
+            return
+
+        if form.get("javax.faces.partial.ajax") == "true":
+            documents = self.portal.query(ano, mes, dia)
+            rows = int(form.get("rows") or self.portal.page_size)
+            pages = max(1, -(-len(documents) // rows))
+            page = min(int(form.get("page") or 0), pages - 1)
+            data = {"table": self.portal.table_html(documents, page, rows), "page": page, "pages": pages,
+                    "rowCount": len(documents), "rows": rows}
+            self.send(200, json.dumps(data).encode("utf-8"), "application/json")
+            return
+
+        links = [LINK_PATTERN.match(name) for name in form]
+        link = next((match for match in links if match), None)
+        if link:
+            self.download(self.portal.query(ano, mes, dia), int(link.group(1)), link.group(2))
+            return
+
+        # "Consultar": a new search with the submitted dates
+        def number(name, default):
+            value = form.get(f"frmPrincipal:{name}", "")
+            return int(value) if value.isdigit() else default
+
+        html = self.portal.page_html(number("ano", ano), number("mes", 0), number("dia", 0))
+        self.send(200, html.encode("utf-8"))
+
+    def download(self, documents, index, link):
+        if index >= len(documents):
+            self.send(200, b"<html><body>Error: documento no encontrado</body></html>")
+            return
+        if self.portal.fails():
+            # No content: the browser stays on the page and no download starts
+            self.send(204, b"")
+            return
+        document = documents[index]
+        if link == "lnkXml":
+            data, suffix, content_type = self.portal.document_xml(document.number), "xml", "application/xml"
+        else:
+            data, suffix, content_type = self.portal.document_pdf(document.number), "pdf", "application/pdf"
+        disposition = f'attachment; filename="{document.clave_acceso}.{suffix}"'
+        self.send(200, data, content_type, headers=[("Content-Disposition", disposition)])
+
+    def soap(self, body):
+        match = re.search(r"<claveAccesoComprobante>(\d+)</claveAccesoComprobante>", body)
+        if self.portal.fails() or not match:
+            fault = ('<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body><soap:Fault>'
+                     '<faultcode>soap:Server</faultcode><faultstring>Servicio no disponible</faultstring>'
+                     '</soap:Fault></soap:Body></soap:Envelope>')
+            self.send(500, fault.encode("utf-8"), "text/xml; charset=utf-8")
+            return
+
+        document = self.portal.by_clave.get(match.group(1))
+        autorizaciones = ""
+        if document:
+            autorizacion = self.portal.document_xml(document.number).decode("utf-8").split("?>", 1)[1]
+            autorizaciones = autorizacion.replace("<mensajes/>", "")
+        response = f"""<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>
+<ns2:autorizacionComprobanteResponse xmlns:ns2="http://ec.gob.sri.ws.autorizacion"><RespuestaAutorizacionComprobante>
+<claveAccesoConsultada>{match.group(1)}</claveAccesoConsultada><numeroComprobantes>{1 if document else 0}</numeroComprobantes>
+<autorizaciones>{autorizaciones}</autorizaciones></RespuestaAutorizacionComprobante>
+</ns2:autorizacionComprobanteResponse></soap:Body></soap:Envelope>"""
+        self.send(200, response.encode("utf-8"), "text/xml; charset=utf-8")
+
+
+# Run the mock portal on its own: python mock_portal.py --documents 1000 --latency 0.2
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the SRI comprobantes recibidos portal")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--documents", type=int, default=500, help="synthetic documents in the listing")
+    parser.add_argument("--page-size", type=int, default=50, help="rows per page before the downloader changes it")
+    parser.add_argument("--latency", type=float, default=0.05, help="average seconds every request takes")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of downloads that fail")
+    args = parser.parse_args()
+
+    portal = MockPortal(documents=args.documents, page_size=args.page_size, latency=args.latency,
+                        error_rate=args.error_rate, port=args.port)
+    print(f"🧪 Mock SRI portal at {portal.url}")
+    print(f"🧪 Autorización web service at {portal.soap_url}")
+    try:
+        portal.server.serve_forever()
+    except KeyboardInterrupt:
+        portal.stop()
@@ -0,0 +1,50 @@
+import os
+import threading
+from pathlib import Path
+
+
+class DestinationIndex:
+    """File names taken in the output folders, so picking a free name needs no stat per try.
+
+    Each folder is listed once (os.scandir, no stat per entry) the first time a name is
+    claimed in it; from then on every claim is added to the index. A counter per name
+    remembers the last "_N" handed out, so a month of repeated invoice numbers does not
+    walk "_1", "_2"... again on every document. Shared by the pool workers of a run.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.names = {}  # folder -> names in it (case-folded where the filesystem ignores case)
+        self.counters = {}  # (folder, stem, suffix) -> next "_N" to try
+
+    def _names(self, directory):
+        names = self.names.get(directory)
+        if names is None:
+            try:
+                with os.scandir(directory) as entries:
+                    names = {os.path.normcase(entry.name) for entry in entries}
+            except FileNotFoundError:
+                names = set()
+            self.names[directory] = names
+        return names
+
+    def claim(self, directory, stem, suffix):
+        """Reserve and return a free path `stem{suffix}`, `stem_1{suffix}`... in directory"""
+        directory = Path(directory)
+        with self.lock:
+            names = self._names(directory)
+            name = f"{stem}{suffix}"
+            key = (directory, stem, suffix)
+            counter = self.counters.get(key, 1)
+            while os.path.normcase(name) in names:
+                name = f"{stem}_{counter}{suffix}"
+                counter += 1
+            self.counters[key] = counter
+            names.add(os.path.normcase(name))
+            return directory / name
+
+    def release(self, path):
+        """Give back a claimed name whose file was never written"""
+        path = Path(path)
+        with self.lock:
+            self._names(path.parent).discard(os.path.normcase(path.name))
@@ -0,0 +1,89 @@
+import time
+
+# Pauses of the download loop at pace x1.0, the fixed delays the script always used
+BASE_DELAYS = {
+    "file": 0.5,  # between the XML and the PDF click of a row
+    "row": 0.2,  # between two rows
+    "move": 0.5,  # before rescanning the staging folder for files the watcher did not name
+}
+
+
+class PacingController:
+    """AIMD pacing of the pauses between portal actions.
+
+    All pauses are their base delay times a common scale. Each quick success lowers
+    the scale by a fixed step (additive), each timeout, error or slow response
+    multiplies it (multiplicative), so the loop runs as fast as the portal allows
+    and backs off at once when it struggles.
+    """
+
+    def __init__(self, adaptive=True, base_delays=None, step=0.1, backoff=2.0, min_scale=0.25, max_scale=8.0,
+                 slow_factor=3.0, slow_after=10.0):
+        self.adaptive = adaptive
+        self.base_delays = dict(base_delays or BASE_DELAYS)
+        self.step = step
+        self.backoff = backoff
+        self.min_scale = min_scale  # above 0: even a fast portal gets a short pause between clicks
+        self.max_scale = max_scale
+        # A response is slow past slow_after seconds or slow_factor times the usual response time
+        self.slow_factor = slow_factor
+        self.slow_after = slow_after
+        self.scale = 1.0
+        self.averages = {}  # moving average of successful response times, documents and pages apart
+        self.paused = 0.0  # pauses taken inside the action being timed, not part of the response time
+        self.documents = 0
+        self.started = time.monotonic()
+
+    def delay(self, name):
+        return self.base_delays[name] * self.scale
+
+    def pause(self, name):
+        delay = self.delay(name)
+        if delay > 0:
+            time.sleep(delay)
+            self.paused += delay
+
+    def docs_per_minute(self):
+        elapsed = time.monotonic() - self.started
+        return self.documents / elapsed * 60 if elapsed > 0 else 0.0
+
+    def is_slow(self, duration, kind):
+        if duration > self.slow_after:
+            return True
+        average = self.averages.get(kind)
+        return average is not None and duration > average * self.slow_factor
+
+    def start(self):
+        """Start timing an action; pass the returned value to record()"""
+        self.paused = 0.0
+        return time.monotonic()
+
+    def record(self, ok, started, document=True):
+        """Feed the outcome of one action (a document download, a page change) and adjust the pace"""
+        duration = max(0.0, time.monotonic() - started - self.paused)
+        kind = "document" if document else "page"
+        slow = ok and self.is_slow(duration, kind)
+        if ok:
+            average = self.averages.get(kind)
+            self.averages[kind] = duration if average is None else 0.8 * average + 0.2 * duration
+            if document:
+                self.documents += 1
+        if not self.adaptive:
+            return
+
+        old_scale = self.scale
+        if ok and not slow:
+            self.scale = max(self.min_scale, self.scale - self.step)
+            reason = f"ok in {duration:.1f}s"
+        else:
+            # Back off from at least one step, a multiple of zero would never slow down
+            self.scale = min(self.max_scale, max(self.scale, self.step) * self.backoff)
+            reason = f"{'slow response' if slow else 'timeout or error'} after {duration:.1f}s"
+        if self.scale < old_scale:
+            icon, change = "🐇", f"x{old_scale:.2f} → x{self.scale:.2f}"
+        elif self.scale > old_scale:
+            icon, change = "🐢", f"x{old_scale:.2f} → x{self.scale:.2f}"
+        else:
+            icon = "⏸️"
+            change = f"x{self.scale:.2f}, at the {'floor' if ok and not slow else 'ceiling'}"
+        print(f"  {icon} Pace {change} ({reason}), {self.docs_per_minute():.1f} docs/min")
@@ -0,0 +1,80 @@
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Bucket state on disk: tokens left and when they were counted (wall clock, shared by every process)
+STATE = struct.Struct("dd")
+
+
+class TokenBucket:
+    """Token bucket shared by every thread and process that opens the same state file.
+
+    Allows `rate` actions per second on average and bursts of up to `burst` actions.
+    The state lives in a 16-byte file updated under an exclusive file lock, so pool
+    workers and separate runs of the script draw from one budget.
+    """
+
+    def __init__(self, rate, burst, path):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.path = Path(path)
+        self.local_lock = threading.Lock()  # threads of this process queue here before the file lock
+
+    def _locked(self, f):
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after 10 seconds
+                    continue
+
+    def _unlock(self, f):
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _reserve(self, tokens):
+        """Take the tokens, possibly into debt; returns how long to wait before acting"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        with os.fdopen(fd, "r+b") as f:
+            self._locked(f)
+            try:
+                now = time.time()
+                data = f.read(STATE.size)
+                if len(data) == STATE.size:
+                    available, stamp = STATE.unpack(data)
+                    available = min(self.burst, available + max(0.0, now - stamp) * self.rate)
+                else:
+                    available = float(self.burst)
+                available -= tokens
+                f.seek(0)
+                f.write(STATE.pack(available, now))
+                f.flush()
+            finally:
+                self._unlock(f)
+        # Tokens went negative: the debt is paid off at `rate` tokens per second
+        return max(0.0, -available / self.rate)
+
+    def acquire(self, tokens=1):
+        """Block until the action may go ahead; returns the seconds waited"""
+        with self.local_lock:
+            delay = self._reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
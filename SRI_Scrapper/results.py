@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+class DownloadResult:
+    """Outcome of one document, as yielded by SRIDownloader.iter_page() and iter_pages().
+
+    Truthy when every wanted file is on disk (status "complete" or "skipped"), so it
+    can stand in for the old boolean return values.
+    """
+    __slots__ = ("key", "session", "source", "page", "index", "factura", "clave_acceso", "status",
+                 "xml_path", "xml_bytes", "pdf_path", "pdf_bytes", "seconds", "paused_seconds", "finished_at")
+
+    def __init__(self, key, status, session=None, source="portal", page=None, index=None, factura=None,
+                 clave_acceso=None, xml_path=None, xml_bytes=None, pdf_path=None, pdf_bytes=None,
+                 seconds=None, paused_seconds=None, finished_at=None):
+        self.key = key  # manifest key: the access key, or "factura|ruc" without one
+        self.status = status  # complete, partial, failed or skipped
+        self.session = session
+        self.source = source  # portal, soap (web service) or ride (rendered locally)
+        self.page = page
+        self.index = index
+        self.factura = factura
+        self.clave_acceso = clave_acceso
+        self.xml_path = xml_path
+        self.xml_bytes = xml_bytes
+        self.pdf_path = pdf_path
+        self.pdf_bytes = pdf_bytes
+        self.seconds = seconds
+        self.paused_seconds = paused_seconds  # pacing and rate limit waits included in seconds
+        self.finished_at = finished_at if finished_at is not None else time.time()
+
+    def __bool__(self):
+        return self.status in ("complete", "skipped")
+
+    def __repr__(self):
+        return f"DownloadResult({self.factura or self.key!r}, {self.status})"
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ResultStream:
+    """One JSON line per document outcome, appended and flushed as the run goes.
+
+    Downstream jobs can `tail -f` the file (or read it after a crash) instead of
+    rescanning the output folders; `summary()` totals what was written. A document
+    retried later gets one line per attempt, the last one is its final outcome.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.file = None  # opened on the first record, so runs that download nothing leave no file
+        self.lock = threading.Lock()  # shared by the pool workers and the asyncio pipeline's threads
+        self.started = time.time()
+        self.statuses = {}
+        self.bytes = 0
+        self.records = 0
+
+    def write(self, result):
+        record = result.to_dict()
+        line = json.dumps(record, ensure_ascii=False)
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, "a", encoding="utf-8")
+            self.file.write(line + "\n")
+            self.file.flush()
+            self.records += 1
+            self.statuses[record["status"]] = self.statuses.get(record["status"], 0) + 1
+            self.bytes += (record.get("xml_bytes") or 0) + (record.get("pdf_bytes") or 0)
+
+    def summary(self, **extra):
+        """Totals of the stream so far, plus whatever the caller knows about the run"""
+        with self.lock:
+            finished = time.time()
+            elapsed = finished - self.started
+            downloaded = self.statuses.get("complete", 0) + self.statuses.get("partial", 0)
+            summary = {
+                "started": self.started,
+                "finished": finished,
+                "seconds": round(elapsed, 3),
+                "records": self.records,
+                "statuses": dict(self.statuses),
+                "bytes": self.bytes,
+                "docs_per_minute": round(downloaded / elapsed * 60, 2) if elapsed > 0 else 0.0,
+                "results_path": str(self.path) if self.records else None,
+            }
+        summary.update(extra)
+        return summary
+
+    def write_summary(self, path, **extra):
+        """Write summary() as JSON through a temporary file; returns the summary"""
+        summary = self.summary(**extra)
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+        return summary
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
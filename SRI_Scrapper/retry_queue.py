@@ -0,0 +1,70 @@
+import random
+import time
+
+
+class RetryEntry:
+    """A document that is still missing a file, and when it may be tried again"""
+    __slots__ = ("row", "page", "attempts", "due")
+
+    def __init__(self, row, page):
+        self.row = row
+        self.page = page
+        self.attempts = 0
+        self.due = 0.0
+
+
+class RetryQueue:
+    """Failed documents of the current listing, retried with exponential backoff and jitter.
+
+    A document gets at most `max_attempts` tries in total: the first pass, the retries
+    on its own page, and the last one kept for the final sweep over every page.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=2.0, max_delay=60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.entries = {}
+        self.exhausted = {}
+
+    def delay(self, attempts):
+        """Exponential backoff with "equal jitter": half fixed, half random"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def record_failure(self, key, row, page):
+        """Count a failed attempt; returns False once the document used up its attempts"""
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = RetryEntry(row, page)
+        entry.row, entry.page = row, page
+        entry.attempts += 1
+        if entry.attempts >= self.max_attempts:
+            self.exhausted[key] = self.entries.pop(key)
+            return False
+        entry.due = time.monotonic() + self.delay(entry.attempts)
+        return True
+
+    def record_success(self, key):
+        self.entries.pop(key, None)
+
+    def retryable_on_page(self, page):
+        """Entries of a page that may still be retried there, leaving their last attempt for the sweep"""
+        return {key: entry for key, entry in self.entries.items()
+                if entry.page == page and entry.attempts < self.max_attempts - 1}
+
+    def wait_until_due(self, entries):
+        """Sleep until the earliest of the entries is due"""
+        delay = min(entry.due for entry in entries) - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pages(self):
+        """{page: {keys}} of every document still waiting for the final sweep"""
+        pages = {}
+        for key, entry in self.entries.items():
+            pages.setdefault(entry.page, set()).add(key)
+        return dict(sorted(pages.items(), key=lambda item: item[0] or 0))
+
+    def clear(self):
+        self.entries.clear()
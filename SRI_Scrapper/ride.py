@@ -0,0 +1,329 @@
+import argparse
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Code 128 bar/space widths of every symbol value (106 is the stop symbol)
+CODE128_PATTERNS = (
+    "212222", "222122", "222221", "121223", "121322", "131222", "122213", "122312", "132212", "221213",
+    "221312", "231212", "112232", "122132", "122231", "113222", "123122", "123221", "223211", "221132",
+    "221231", "213212", "223112", "312131", "311222", "321122", "321221", "312212", "322112", "322211",
+    "212123", "212321", "232121", "111323", "131123", "131321", "112313", "132113", "132311", "211313",
+    "231113", "231311", "112133", "112331", "132131", "113123", "113321", "133121", "313121", "211331",
+    "231131", "213113", "213311", "213131", "311123", "311321", "331121", "312113", "312311", "332111",
+    "314111", "221411", "431111", "111224", "111422", "121124", "121421", "141122", "141221", "112214",
+    "112412", "122114", "122411", "142112", "142211", "241211", "221114", "413111", "241112", "134111",
+    "111242", "121142", "121241", "114212", "124112", "124211", "411212", "421112", "421211", "212141",
+    "214121", "412121", "111143", "111341", "131141", "114113", "114311", "411113", "411311", "113141",
+    "114131", "311141", "411131", "211412", "211214", "211232", "2331112",
+)
+CODE_B, START_B, START_C, STOP = 100, 104, 105, 106
+
+DOCUMENT_NAMES = {
+    "factura": "FACTURA",
+    "notaCredito": "NOTA DE CRÉDITO",
+    "notaDebito": "NOTA DE DÉBITO",
+    "comprobanteRetencion": "COMPROBANTE DE RETENCIÓN",
+    "guiaRemision": "GUÍA DE REMISIÓN",
+    "liquidacionCompra": "LIQUIDACIÓN DE COMPRA",
+}
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 36
+
+
+def code128_values(text):
+    """Symbol values encoding `text`: set C for digit pairs, set B for a trailing odd character"""
+    if text.isdigit() and len(text) >= 2:
+        pairs_end = len(text) - len(text) % 2
+        values = [START_C] + [int(text[i:i + 2]) for i in range(0, pairs_end, 2)]
+        if pairs_end < len(text):
+            values += [CODE_B, ord(text[-1]) - 32]
+    else:
+        values = [START_B] + [ord(c) - 32 for c in text]
+    checksum = (values[0] + sum(i * value for i, value in enumerate(values[1:], 1))) % 103
+    return values + [checksum, STOP]
+
+
+def code128_bars(text):
+    """(offset, width) of every bar in modules, for drawing the barcode"""
+    bars = []
+    position = 0
+    for value in code128_values(text):
+        for i, width in enumerate(CODE128_PATTERNS[value]):
+            if i % 2 == 0:
+                bars.append((position, int(width)))
+            position += int(width)
+    return bars, position
+
+
+def _pdf_text(text):
+    # Standard fonts with WinAnsiEncoding cover the Spanish accents
+    data = text.encode("cp1252", "replace")
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+class PDFCanvas:
+    """Just enough of PDF to draw text, lines and filled rectangles on A4 pages"""
+
+    def __init__(self):
+        self.pages = []
+        self.new_page()
+
+    def new_page(self):
+        self.ops = []
+        self.pages.append(self.ops)
+
+    def text(self, x, y, text, size=8, bold=False):
+        font = "F2" if bold else "F1"
+        self.ops.append(b"BT /%s %g Tf %g %g Td (%s) Tj ET" % (font.encode(), size, x, y, _pdf_text(text)))
+
+    def rect(self, x, y, width, height, fill=False):
+        self.ops.append(b"%g %g %g %g re %s" % (x, y, width, height, b"f" if fill else b"S"))
+
+    def line(self, x1, y1, x2, y2):
+        self.ops.append(b"%g %g m %g %g l S" % (x1, y1, x2, y2))
+
+    def barcode(self, x, y, text, width, height):
+        bars, modules = code128_bars(text)
+        module = width / modules
+        for offset, bar_width in bars:
+            self.rect(x + offset * module, y, bar_width * module, height, fill=True)
+
+    def to_bytes(self):
+        # Objects: 1 catalog, 2 page tree, 3-4 fonts, then a page and its content stream per page
+        objects = [None, None,
+                   b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+                   b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>"]
+        kids = []
+        for ops in self.pages:
+            content = b"0.5 w\n" + b"\n".join(ops)
+            page_number = len(objects) + 1
+            kids.append(b"%d 0 R" % page_number)
+            objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+                           b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>"
+                           % (PAGE_WIDTH, PAGE_HEIGHT, page_number + 1))
+            objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+        objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids))
+
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(len(out))
+            out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+        xref = len(out)
+        out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+        out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+        out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+        return bytes(out)
+
+
+def _child_text(element, *names):
+    """Text of the first child found among `names`, or an empty string"""
+    if element is None:
+        return ""
+    for name in names:
+        child = element.find(name)
+        if child is not None and child.text:
+            return child.text.strip()
+    return ""
+
+
+def parse_document(xml_bytes):
+    """Read the data a RIDE shows from an authorized XML (the <autorizacion> wrapper or a bare comprobante)"""
+    root = ET.fromstring(xml_bytes)
+    autorizacion = {}
+    if root.tag == "autorizacion" or root.find("comprobante") is not None:
+        autorizacion = {child.tag: (child.text or "").strip() for child in root if child.tag != "comprobante"}
+        root = ET.fromstring(root.find("comprobante").text.strip())
+
+    tributaria = root.find("infoTributaria")
+    info = next((child for child in root if child.tag.startswith("info") and child.tag != "infoTributaria"), None)
+    return {
+        "tipo": DOCUMENT_NAMES.get(root.tag, root.tag.upper()),
+        "razon_social": _child_text(tributaria, "razonSocial"),
+        "nombre_comercial": _child_text(tributaria, "nombreComercial"),
+        "ruc": _child_text(tributaria, "ruc"),
+        "numero": "-".join(_child_text(tributaria, name) for name in ("estab", "ptoEmi", "secuencial")),
+        "clave_acceso": _child_text(tributaria, "claveAcceso"),
+        "dir_matriz": _child_text(tributaria, "dirMatriz"),
+        "ambiente": autorizacion.get("ambiente") or {"1": "PRUEBAS", "2": "PRODUCCIÓN"}.get(
+            _child_text(tributaria, "ambiente"), ""),
+        "numero_autorizacion": autorizacion.get("numeroAutorizacion") or _child_text(tributaria, "claveAcceso"),
+        "fecha_autorizacion": autorizacion.get("fechaAutorizacion", ""),
+        "fecha_emision": _child_text(info, "fechaEmision"),
+        "comprador": _child_text(info, "razonSocialComprador", "razonSocialSujetoRetenido", "razonSocialProveedor",
+                                 "razonSocialDestinatario"),
+        "identificacion": _child_text(info, "identificacionComprador", "identificacionSujetoRetenido",
+                                      "identificacionProveedor", "rucTransportista"),
+        "detalles": [
+            {
+                "codigo": _child_text(detalle, "codigoPrincipal", "codigoInterno", "codigoAuxiliar"),
+                "descripcion": _child_text(detalle, "descripcion"),
+                "cantidad": _child_text(detalle, "cantidad"),
+                "precio_unitario": _child_text(detalle, "precioUnitario"),
+                "descuento": _child_text(detalle, "descuento"),
+                "total": _child_text(detalle, "precioTotalSinImpuesto"),
+            }
+            for detalle in root.iter("detalle")
+        ],
+        "impuestos": [
+            (_child_text(impuesto, "codigoPorcentaje"), _child_text(impuesto, "baseImponible"),
+             _child_text(impuesto, "valor"))
+            for impuesto in (info.iter("totalImpuesto") if info is not None else ())
+        ],
+        "totales": [
+            (label, _child_text(info, *names))
+            for label, names in (
+                ("SUBTOTAL SIN IMPUESTOS", ("totalSinImpuestos",)),
+                ("TOTAL DESCUENTO", ("totalDescuento",)),
+                ("PROPINA", ("propina",)),
+                ("VALOR TOTAL", ("importeTotal", "valorTotal", "valorModificacion")),
+            )
+            if _child_text(info, *names)
+        ],
+        "adicional": [(campo.get("nombre", ""), (campo.text or "").strip()) for campo in root.iter("campoAdicional")],
+    }
+
+
+def _wrap(text, width):
+    """Split text in lines of at most `width` characters, on spaces when possible"""
+    lines = []
+    while len(text) > width:
+        cut = text.rfind(" ", 0, width)
+        cut = cut if cut > 0 else width
+        lines.append(text[:cut])
+        text = text[cut:].lstrip()
+    return lines + [text]
+
+
+def render_ride(document):
+    """Draw the RIDE (representación impresa) of a parsed document; returns the PDF bytes"""
+    pdf = PDFCanvas()
+    left, right = MARGIN, PAGE_WIDTH - MARGIN
+    middle = PAGE_WIDTH / 2
+
+    # Issuer box on the left, authorization box with the access key barcode on the right
+    y = PAGE_HEIGHT - MARGIN
+    pdf.text(left, y - 14, document["razon_social"][:48], size=11, bold=True)
+    if document["nombre_comercial"]:
+        pdf.text(left, y - 30, document["nombre_comercial"][:60], size=8)
+    for i, line in enumerate(_wrap(f"Dirección Matriz: {document['dir_matriz']}", 55)[:3]):
+        pdf.text(left, y - 46 - i * 10, line)
+
+    box_x = middle + 6
+    pdf.rect(box_x, y - 190, right - box_x, 190)
+    pdf.text(box_x + 8, y - 16, f"R.U.C.: {document['ruc']}", size=10, bold=True)
+    pdf.text(box_x + 8, y - 32, document["tipo"], size=11, bold=True)
+    pdf.text(box_x + 8, y - 46, f"No. {document['numero']}", size=9)
+    pdf.text(box_x + 8, y - 62, "NÚMERO DE AUTORIZACIÓN", size=7, bold=True)
+    pdf.text(box_x + 8, y - 72, document["numero_autorizacion"], size=6.5)
+    pdf.text(box_x + 8, y - 86, f"FECHA Y HORA DE AUTORIZACIÓN: {document['fecha_autorizacion']}", size=7)
+    pdf.text(box_x + 8, y - 98, f"AMBIENTE: {document['ambiente']}", size=7)
+    pdf.text(box_x + 8, y - 110, "EMISIÓN: NORMAL", size=7)
+    pdf.text(box_x + 8, y - 124, "CLAVE DE ACCESO", size=7, bold=True)
+    if document["clave_acceso"]:
+        pdf.barcode(box_x + 8, y - 168, document["clave_acceso"], right - box_x - 16, 40)
+        pdf.text(box_x + 8, y - 180, document["clave_acceso"], size=6.5)
+
+    # Buyer
+    y -= 206
+    pdf.rect(left, y - 32, right - left, 32)
+    pdf.text(left + 6, y - 12, f"Razón Social / Nombres: {document['comprador'][:70]}", size=8)
+    pdf.text(left + 6, y - 25, f"Identificación: {document['identificacion']}", size=8)
+    pdf.text(middle + 40, y - 25, f"Fecha Emisión: {document['fecha_emision']}", size=8)
+
+    # Detail table, continued on new pages when it does not fit
+    columns = ((left, "Cód."), (left + 70, "Cant."), (left + 110, "Descripción"), (left + 360, "P. Unitario"),
+               (left + 420, "Descuento"), (left + 475, "Total"))
+
+    def table_header(top):
+        pdf.rect(left, top - 14, right - left, 14)
+        for x, title in columns:
+            pdf.text(x + 3, top - 10, title, size=7, bold=True)
+        return top - 14
+
+    y = table_header(y - 44)
+    for detalle in document["detalles"]:
+        description = _wrap(detalle["descripcion"], 55)
+        height = 11 * len(description) + 3
+        if y - height < MARGIN + 40:
+            pdf.new_page()
+            y = table_header(PAGE_HEIGHT - MARGIN)
+        values = (detalle["codigo"][:14], detalle["cantidad"], None, detalle["precio_unitario"], detalle["descuento"],
+                  detalle["total"])
+        for (x, _), value in zip(columns, values):
+            if value is not None:
+                pdf.text(x + 3, y - 10, value, size=7)
+        for i, line in enumerate(description):
+            pdf.text(columns[2][0] + 3, y - 10 - i * 11, line, size=7)
+        y -= height
+        pdf.line(left, y, right, y)
+
+    # Totals on the right, additional information on the left
+    subtotals = [total for total in document["totales"] if total[0] in ("SUBTOTAL SIN IMPUESTOS", "TOTAL DESCUENTO")]
+    totals = subtotals + [(f"IVA ({codigo}) BASE {base}", valor) for codigo, base, valor in document["impuestos"]]
+    totals += [total for total in document["totales"] if total not in subtotals]
+    needed = 14 * max(len(totals), len(document["adicional"]) + 1) + 20
+    if y - needed < MARGIN:
+        pdf.new_page()
+        y = PAGE_HEIGHT - MARGIN
+    y -= 16
+    for i, (label, value) in enumerate(totals):
+        pdf.text(middle + 60, y - i * 14, label[:32], size=7, bold=label == "VALOR TOTAL")
+        pdf.text(right - 60, y - i * 14, value, size=7, bold=label == "VALOR TOTAL")
+    if document["adicional"]:
+        pdf.text(left, y, "Información Adicional", size=8, bold=True)
+        for i, (name, value) in enumerate(document["adicional"], 1):
+            pdf.text(left, y - i * 14, f"{name}: {value}"[:60], size=7)
+    return pdf.to_bytes()
+
+
+def render_file(xml_path, pdf_path):
+    """Render one XML file into a RIDE PDF; returns the PDF path"""
+    pdf_path = Path(pdf_path)
+    data = render_ride(parse_document(Path(xml_path).read_bytes()))
+    part_path = pdf_path.with_name(pdf_path.name + ".part")
+    part_path.write_bytes(data)
+    part_path.replace(pdf_path)
+    return pdf_path
+
+
+def render_many(jobs, processes=None):
+    """Render many (xml_path, pdf_path) pairs on a process pool.
+
+    Yields (xml_path, pdf_path, error) in input order; error is None when the PDF was written.
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return
+    processes = processes or min(len(jobs), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(render_file, xml_path, pdf_path) for xml_path, pdf_path in jobs]
+        for (xml_path, pdf_path), future in zip(jobs, futures):
+            try:
+                yield xml_path, future.result(), None
+            except Exception as e:
+                yield xml_path, pdf_path, e
+
+
+# Render XMLs already on disk: python ride.py factura.xml otra_carpeta/ -o pdfs/
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the RIDE PDF of authorized SRI XML files")
+    parser.add_argument("paths", nargs="+", help="XML files or folders containing them")
+    parser.add_argument("-o", "--output", help="folder for the PDFs (default: next to each XML)")
+    parser.add_argument("--processes", type=int, help="renderer processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    xml_files = []
+    for path in map(Path, args.paths):
+        xml_files += sorted(path.glob("*.xml")) if path.is_dir() else [path]
+    output = Path(args.output) if args.output else None
+    if output:
+        output.mkdir(parents=True, exist_ok=True)
+
+    jobs = [(xml_file, (output or xml_file.parent) / f"{xml_file.stem}.pdf") for xml_file in xml_files]
+    for xml_file, pdf_file, error in render_many(jobs, args.processes):
+        print(f"❌ {xml_file.name}: {error}" if error else f"📄 {pdf_file}")
@@ -0,0 +1,58 @@
+import calendar
+from collections import namedtuple
+from datetime import date, timedelta
+
+# Search form fields of the comprobantes recibidos query (día "0" means the whole month)
+YEAR_FIELD = "frmPrincipal:ano"
+MONTH_FIELD = "frmPrincipal:mes"
+DAY_FIELD = "frmPrincipal:dia"
+
+
+class Shard(namedtuple("Shard", "year month day")):
+    """One query of the listing: a whole month when day is 0, otherwise a single day"""
+    __slots__ = ()
+
+    @property
+    def label(self):
+        if self.day:
+            return f"{self.year:04d}-{self.month:02d}-{self.day:02d}"
+        return f"{self.year:04d}-{self.month:02d}"
+
+
+def plan_shards(start, end, granularity="month"):
+    """Split the date range [start, end] into shards.
+
+    With month granularity, months the range only partly covers become day shards,
+    so no shard asks for documents outside the range.
+    """
+    if end < start:
+        raise ValueError(f"End date {end} is before start date {start}")
+
+    shards = []
+    current = start
+    while current <= end:
+        month_days = calendar.monthrange(current.year, current.month)[1]
+        month_end = date(current.year, current.month, month_days)
+        if granularity == "month" and current.day == 1 and month_end <= end:
+            shards.append(Shard(current.year, current.month, 0))
+            current = month_end + timedelta(days=1)
+        else:
+            shards.append(Shard(current.year, current.month, current.day))
+            current += timedelta(days=1)
+    return shards
+
+
+def split_shard(shard):
+    """Split a month shard into its days; a day shard cannot be split further"""
+    if shard.day:
+        return []
+    month_days = calendar.monthrange(shard.year, shard.month)[1]
+    return [Shard(shard.year, shard.month, day) for day in range(1, month_days + 1)]
+
+
+def shard_fields(shard, base_fields):
+    """Search form (id, value) pairs for a shard, keeping the other criteria of base_fields"""
+    date_fields = {YEAR_FIELD: str(shard.year), MONTH_FIELD: str(shard.month), DAY_FIELD: str(shard.day)}
+    fields = [(field_id, value) for field_id, value in base_fields if field_id not in date_fields]
+    # Year before month before day: each one reloads the options of the next
+    return fields + list(date_fields.items())
@@ -0,0 +1,86 @@
+import re
+
+# Columns of the "Descargar reporte" TXT of comprobantes recibidos (tab separated)
+CLAVE_ACCESO_COLUMN = "CLAVE_ACCESO"
+CLAVE_ACCESO_PATTERN = re.compile(r"\b\d{49}\b")
+# Free text column, the only one that has been seen holding tabs of its own
+RAZON_SOCIAL_COLUMN = "RAZON_SOCIAL_EMISOR"
+
+
+def decode_line(raw):
+    """The portal has served the report both as UTF-8 and as Latin-1"""
+    try:
+        return raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return raw.decode("latin-1")
+
+
+def parse_record(header, values):
+    """Turn one report line into a record with the same keys as a table row snapshot"""
+    fields = dict(zip(header, (value.strip() for value in values)))
+    tipo = fields.get("COMPROBANTE", "")
+    serie = fields.get("SERIE_COMPROBANTE", "")
+    return {
+        "index": None,
+        "factura": f"{tipo} {serie}".strip(),
+        "emisor": fields.get("RAZON_SOCIAL_EMISOR", ""),
+        "ruc": fields.get("RUC_EMISOR", ""),
+        "fecha": fields.get("FECHA_EMISION", ""),
+        "clave_acceso": fields.get(CLAVE_ACCESO_COLUMN, ""),
+    }
+
+
+def realign(header, values):
+    """Put the values of a line whose columns shifted back under their header.
+
+    Extra tabs inside the razón social push every later column to the right; the
+    access key's position tells by how much. Returns None when the line cannot be
+    placed that way, then only the access key can be trusted.
+    """
+    if RAZON_SOCIAL_COLUMN not in header:
+        return None
+    key_column = header.index(CLAVE_ACCESO_COLUMN)
+    text_column = header.index(RAZON_SOCIAL_COLUMN)
+    # The first 49 digit value from the key's column on (the autorización number usually repeats it)
+    positions = [i for i, value in enumerate(values)
+                 if i >= key_column and CLAVE_ACCESO_PATTERN.fullmatch(value.strip())]
+    if not positions:
+        return None
+    shift = positions[0] - key_column
+    if shift <= 0 or text_column > key_column or len(values) - shift < len(header):
+        return None
+    text = " ".join(value.strip() for value in values[text_column:text_column + shift + 1])
+    return values[:text_column] + [text] + values[text_column + shift + 1:]
+
+
+def iter_report(path):
+    """Yield one record per comprobante, reading the report a line at a time"""
+    header = None
+    with open(path, "rb") as f:
+        for raw in f:
+            line = decode_line(raw).rstrip("\r\n")
+            if not line.strip():
+                continue
+            values = line.split("\t")
+            if header is None:
+                if CLAVE_ACCESO_COLUMN in (value.strip().upper() for value in values):
+                    header = [value.strip().upper() for value in values]
+                continue
+
+            record = parse_record(header, values)
+            if not CLAVE_ACCESO_PATTERN.fullmatch(record["clave_acceso"]):
+                # Columns shifted (e.g. a tab inside the razón social): realign them on the access key
+                aligned = realign(header, values)
+                if aligned is not None:
+                    record = parse_record(header, aligned)
+                else:
+                    # Keep only the key found anywhere on the line, the other columns may hold anything
+                    match = CLAVE_ACCESO_PATTERN.search(line)
+                    if not match:
+                        continue
+                    record = dict(record, factura="", emisor="", ruc="", fecha="", clave_acceso=match.group(0))
+            yield record
+
+    if header is None:
+        raise ValueError(f"{path} does not look like an SRI report, no {CLAVE_ACCESO_COLUMN} header found")
+
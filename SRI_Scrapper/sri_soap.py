@@ -0,0 +1,124 @@
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from xml.sax.saxutils import escape
+
+import urllib3  # installed with selenium
+
+# SRI web service that returns the authorized XML of a comprobante by its clave de acceso
+AUTORIZACION_URL = "https://cel.sri.gob.ec/comprobantes-electronicos-ws/AutorizacionComprobantesOffline"
+
+SOAP_REQUEST = """<?xml version="1.0" encoding="UTF-8"?>
+<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:ec="http://ec.gob.sri.ws.autorizacion">
+<soapenv:Header/>
+<soapenv:Body>
+<ec:autorizacionComprobante><claveAccesoComprobante>{clave}</claveAccesoComprobante></ec:autorizacionComprobante>
+</soapenv:Body>
+</soapenv:Envelope>"""
+
+# Fields of <autorizacion> copied into the saved file, in the order the portal's XML has them
+AUTORIZACION_FIELDS = ("estado", "numeroAutorizacion", "fechaAutorizacion", "ambiente")
+
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _cdata(text):
+    # "]]>" cannot appear inside a CDATA section, split it across two sections
+    return "<![CDATA[" + text.replace("]]>", "]]]]><![CDATA[>") + "]]>"
+
+
+def autorizacion_xml(autorizacion):
+    """Build the same <autorizacion> document the portal's XML link downloads"""
+    values = {_local_name(child.tag): (child.text or "") for child in autorizacion}
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', "<autorizacion>"]
+    for field in AUTORIZACION_FIELDS:
+        lines.append(f"  <{field}>{escape(values.get(field, '').strip())}</{field}>")
+    lines.append(f"  <comprobante>{_cdata(values.get('comprobante', ''))}</comprobante>")
+    lines.append("  <mensajes/>")
+    lines.append("</autorizacion>")
+    return "\n".join(lines).encode("utf-8")
+
+
+class AutorizacionClient:
+    """Pooled, concurrent client of the autorizacionComprobante SOAP operation"""
+
+    def __init__(self, url=AUTORIZACION_URL, concurrency=8, timeout=30, retries=2, rate_limiter=None,
+                 metrics=None):
+        self.url = url
+        self.concurrency = concurrency
+        self.rate_limiter = rate_limiter  # optional TokenBucket shared with the browser downloads
+        self.metrics = metrics  # optional StageMetrics, requests are timed as "soap_request"
+        self.http = urllib3.PoolManager(
+            maxsize=concurrency,
+            block=True,  # keep-alive connections are reused, never more than `concurrency`
+            timeout=urllib3.Timeout(connect=10, read=timeout),
+            retries=urllib3.Retry(total=retries, backoff_factor=0.5, allowed_methods=None,
+                                  status_forcelist=(502, 503, 504)),
+        )
+
+    def fetch(self, clave):
+        """Return the authorized XML (bytes) of one comprobante"""
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        started = time.perf_counter()
+        response = self.http.request(
+            "POST", self.url,
+            body=SOAP_REQUEST.format(clave=escape(clave)).encode("utf-8"),
+            headers={"Content-Type": "text/xml; charset=utf-8", "SOAPAction": ""},
+        )
+        if self.metrics:
+            self.metrics.observe("soap_request", time.perf_counter() - started)
+        if response.status != 200:
+            raise RuntimeError(f"HTTP {response.status} from the autorización service")
+
+        root = ET.fromstring(response.data)
+        for element in root.iter():
+            if _local_name(element.tag) == "faultstring":
+                raise RuntimeError(f"SOAP fault: {element.text}")
+
+        autorizaciones = [e for e in root.iter() if _local_name(e.tag) == "autorizacion"]
+        for autorizacion in autorizaciones:
+            estado = next((c.text for c in autorizacion if _local_name(c.tag) == "estado"), "")
+            if (estado or "").strip() == "AUTORIZADO":
+                return autorizacion_xml(autorizacion)
+        if autorizaciones:
+            raise RuntimeError(f"Comprobante {clave} is not authorized")
+        raise RuntimeError(f"No autorización found for {clave}")
+
+    def fetch_many(self, items, key=lambda item: item):
+        """Fetch many comprobantes concurrently; yields (item, xml_bytes, error, seconds) as each one completes.
+
+        `seconds` counts from the moment a connection slot took the request, not from when
+        it was queued.
+
+        `items` may be any iterable (e.g. a streamed report); only a small window of
+        requests is queued at a time, so memory does not grow with the number of keys.
+        """
+        window = self.concurrency * 2
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="sri-soap") as executor:
+            in_flight = {}
+            for item in items:
+                in_flight[executor.submit(self._timed_fetch, key(item))] = item
+                if len(in_flight) >= window:
+                    yield from self._collect(in_flight, FIRST_COMPLETED)
+            while in_flight:
+                yield from self._collect(in_flight, FIRST_COMPLETED)
+
+    def _timed_fetch(self, clave):
+        started = time.perf_counter()
+        try:
+            return self.fetch(clave), None, time.perf_counter() - started
+        except Exception as e:
+            return None, e, time.perf_counter() - started
+
+    @staticmethod
+    def _collect(in_flight, return_when):
+        done, _ = wait(in_flight, return_when=return_when)
+        for future in done:
+            item = in_flight.pop(future)
+            yield (item, *future.result())
+
+    def close(self):
+        self.http.clear()
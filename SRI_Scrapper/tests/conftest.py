@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The scripts import each other as top-level modules, like when run from SRI_Scrapper/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mock_portal import MockPortal  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def portal():
+    """Mock SRI portal with a small listing and no latency"""
+    portal = MockPortal(documents=40, page_size=10, latency=0, seed=1).start()
+    yield portal
+    portal.stop()
@@ -0,0 +1,77 @@
+import pytest
+
+from http_engine import HTTPDownloadEngine, parse_filename
+
+
+class FormDriver:
+    """What HTTPDownloadEngine.from_driver reads from Selenium: the exported form and the cookies"""
+
+    def __init__(self, action, view_state):
+        self.action = action
+        self.view_state = view_state
+
+    def execute_script(self, script, form_id):
+        fields = [["frmPrincipal", "frmPrincipal"], ["javax.faces.ViewState", self.view_state]]
+        return {"action": self.action, "fields": fields, "userAgent": "pytest", "referer": self.action}
+
+    def get_cookies(self):
+        return [{"name": "JSESSIONID", "value": "mock"}]
+
+
+@pytest.fixture
+def engine(portal):
+    engine = HTTPDownloadEngine.from_driver(FormDriver(portal.url, portal.view_state(portal.year, 0, 0)))
+    yield engine
+    engine.close()
+
+
+def test_fetch_returns_the_named_file(portal, engine):
+    document = portal.query(portal.year, 0, 0)[3]
+
+    filename, data = engine.fetch(3, "XML")
+    assert filename == f"{document.clave_acceso}.xml"
+    assert document.clave_acceso.encode() in data
+
+    filename, data = engine.fetch(3, "PDF")
+    assert filename == f"{document.clave_acceso}.pdf"
+    assert data.startswith(b"%PDF")
+
+
+def test_expired_view_state_raises(portal):
+    engine = HTTPDownloadEngine.from_driver(FormDriver(portal.url, "expired"))
+    try:
+        with pytest.raises(RuntimeError, match="view state expired"):
+            engine.fetch(0, "XML")
+    finally:
+        engine.close()
+
+
+def test_html_answer_raises(engine):
+    # A row the view does not have: JSF answers with an error page instead of the file
+    with pytest.raises(RuntimeError, match="Got a page instead of the PDF file"):
+        engine.fetch(10_000, "PDF")
+
+
+def test_from_driver_needs_a_view_state(portal):
+    class NoViewState(FormDriver):
+        def execute_script(self, script, form_id):
+            return {"action": self.action, "fields": [], "userAgent": "", "referer": ""}
+
+    with pytest.raises(RuntimeError, match="ViewState"):
+        HTTPDownloadEngine.from_driver(NoViewState(portal.url, ""))
+
+
+def test_refresh_from_driver_posts_the_new_view_state(portal, engine):
+    driver = FormDriver(portal.url, portal.view_state(portal.year, 2, 0))  # the browser now shows February
+    engine.refresh_from_driver(driver)
+
+    february = portal.query(portal.year, 2, 0)
+    filename, _ = engine.fetch(0, "XML")
+    assert filename == f"{february[0].clave_acceso}.xml"
+    assert ("javax.faces.ViewState", driver.view_state) in engine.fields
+
+
+def test_parse_filename():
+    assert parse_filename('attachment; filename="a b.xml"') == "a b.xml"
+    assert parse_filename("attachment; filename*=UTF-8''Factura%20001.pdf") == "Factura 001.pdf"
+    assert parse_filename("inline") is None
@@ -0,0 +1,48 @@
+from journal import SessionJournal
+
+
+def test_resume_page(tmp_path):
+    journal = SessionJournal(tmp_path / "journal.json")
+    assert journal.resume_page() == 1
+
+    journal.start_page(1, [0, 1])
+    journal.record_document(1, 0, {"XML": "ok", "PDF": "ok"})
+    journal.record_document(1, 1, {"XML": "ok", "PDF": "ok"})
+    assert journal.complete_page_if_done(1)
+    assert journal.resume_page() == 2
+
+    journal.start_page(2, [0, 1])
+    journal.record_document(2, 0, {"XML": "ok", "PDF": "failed"})
+    journal.start_page(3, [0])
+    assert not journal.complete_page_if_done(2)
+    assert journal.resume_page() == 2
+
+
+def test_resume_page_ignores_shard_pages(tmp_path):
+    journal = SessionJournal(tmp_path / "journal.json")
+    journal.scope = "2024-01"
+    journal.start_page(1, [0])
+    assert journal.resume_page() == 1
+
+
+def test_required_types_and_reload(tmp_path):
+    path = tmp_path / "journal.json"
+    journal = SessionJournal(path, required=("XML",))
+    journal.start_page(1, [0])
+    journal.record_document(1, 0, {"XML": "ok"})
+    assert journal.complete_page_if_done(1)
+
+    loaded = SessionJournal.load(path)
+    assert loaded.state == journal.state
+    assert loaded.resume_page() == 2
+    assert SessionJournal.load(tmp_path / "missing.json") is None
+
+
+def test_page_started_once_a_row_is_recorded(tmp_path):
+    journal = SessionJournal(tmp_path / "journal.json")
+    assert not journal.is_page_started(1)
+    journal.start_page(1, [])  # the table had no download links
+    assert not journal.is_page_started(1)
+    journal.start_page(1, [0])
+    journal.record_document(1, 0, {"XML": "failed"})
+    assert journal.is_page_started(1)
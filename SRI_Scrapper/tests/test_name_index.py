@@ -0,0 +1,31 @@
+from name_index import DestinationIndex
+
+
+def test_claims_skip_existing_and_claimed_names(tmp_path):
+    (tmp_path / "001.xml").write_text("")
+    (tmp_path / "001_1.xml").write_text("")
+    index = DestinationIndex()
+    assert index.claim(tmp_path, "001", ".xml") == tmp_path / "001_2.xml"
+    assert index.claim(tmp_path, "001", ".xml") == tmp_path / "001_3.xml"
+    assert index.claim(tmp_path, "001", ".pdf") == tmp_path / "001.pdf"
+    assert index.claim(tmp_path, "002", ".xml") == tmp_path / "002.xml"
+
+
+def test_folder_is_listed_once(tmp_path):
+    index = DestinationIndex()
+    assert index.claim(tmp_path, "001", ".xml") == tmp_path / "001.xml"
+    # Files created behind the index's back are not seen, callers create the file exclusively
+    (tmp_path / "002.xml").write_text("")
+    assert index.claim(tmp_path, "002", ".xml") == tmp_path / "002.xml"
+
+
+def test_release_frees_the_name(tmp_path):
+    index = DestinationIndex()
+    path = index.claim(tmp_path, "001", ".xml")
+    index.release(path)
+    assert index.claim(tmp_path, "001", ".xml") == path
+
+
+def test_missing_folder(tmp_path):
+    index = DestinationIndex()
+    assert index.claim(tmp_path / "new", "001", ".xml") == tmp_path / "new" / "001.xml"
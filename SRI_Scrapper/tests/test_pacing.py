@@ -0,0 +1,26 @@
+import time
+
+from pacing import PacingController
+
+
+def test_scale_stays_between_the_bounds_and_every_decision_is_logged(capsys):
+    pacing = PacingController(max_scale=2.0, slow_factor=1e9)
+    for _ in range(12):
+        pacing.record(True, time.monotonic())
+    assert pacing.scale == pacing.min_scale > 0
+    assert pacing.delay("row") > 0
+
+    for _ in range(5):
+        pacing.record(False, time.monotonic())
+    assert pacing.scale == 2.0
+
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 17
+    assert "at the floor" in lines[11] and "at the ceiling" in lines[-1]
+
+
+def test_fixed_pacing_keeps_the_scale(capsys):
+    pacing = PacingController(adaptive=False)
+    pacing.record(False, pacing.start())
+    assert pacing.scale == 1.0 and pacing.documents == 0
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,24 @@
+import pytest
+
+from rate_limiter import TokenBucket
+
+
+def test_burst_then_rate(tmp_path):
+    bucket = TokenBucket(rate=20, burst=2, path=tmp_path / "bucket")
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == pytest.approx(0.05, abs=0.02)
+
+
+def test_buckets_on_one_file_share_the_budget(tmp_path):
+    first = TokenBucket(rate=20, burst=1, path=tmp_path / "bucket")
+    second = TokenBucket(rate=20, burst=1, path=tmp_path / "bucket")
+    assert first.acquire() == 0
+    assert second.acquire() > 0
+
+
+def test_invalid_settings(tmp_path):
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0, burst=1, path=tmp_path / "bucket")
+    with pytest.raises(ValueError):
+        TokenBucket(rate=1, burst=0, path=tmp_path / "bucket")
@@ -0,0 +1,44 @@
+import time
+
+from retry_queue import RetryQueue
+
+
+def test_failures_until_exhausted():
+    queue = RetryQueue(max_attempts=3, base_delay=0.01)
+    row = {"index": 4}
+    assert queue.record_failure("a", row, page=2)
+    assert queue.record_failure("a", row, page=2)
+    assert not queue.record_failure("a", row, page=2)
+    assert "a" in queue.exhausted and "a" not in queue.entries
+
+
+def test_last_attempt_is_left_for_the_sweep():
+    queue = RetryQueue(max_attempts=3)
+    queue.record_failure("a", {}, page=1)
+    queue.record_failure("b", {}, page=1)
+    queue.record_failure("b", {}, page=1)
+    queue.record_failure("c", {}, page=2)
+    assert set(queue.retryable_on_page(1)) == {"a"}
+    assert queue.pages() == {1: {"a", "b"}, 2: {"c"}}
+
+
+def test_success_forgets_the_document():
+    queue = RetryQueue()
+    queue.record_failure("a", {}, page=1)
+    queue.record_success("a")
+    assert queue.pages() == {}
+
+
+def test_delay_grows_and_is_capped():
+    queue = RetryQueue(base_delay=2.0, max_delay=10.0)
+    assert 1.0 <= queue.delay(1) <= 2.0
+    assert 2.0 <= queue.delay(2) <= 4.0
+    assert 5.0 <= queue.delay(10) <= 10.0
+
+
+def test_wait_until_due():
+    queue = RetryQueue(base_delay=0.05)
+    queue.record_failure("a", {}, page=1)
+    started = time.monotonic()
+    queue.wait_until_due(queue.entries.values())
+    assert time.monotonic() - started >= 0.02
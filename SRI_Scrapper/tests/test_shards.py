@@ -0,0 +1,38 @@
+from datetime import date
+
+import pytest
+
+from shards import Shard, plan_shards, shard_fields, split_shard
+
+
+def test_whole_months_stay_month_shards():
+    assert plan_shards(date(2024, 1, 1), date(2024, 2, 29)) == [Shard(2024, 1, 0), Shard(2024, 2, 0)]
+
+
+def test_partial_months_become_days():
+    shards = plan_shards(date(2024, 1, 30), date(2024, 3, 2))
+    assert shards == [Shard(2024, 1, 30), Shard(2024, 1, 31), Shard(2024, 2, 0),
+                      Shard(2024, 3, 1), Shard(2024, 3, 2)]
+
+
+def test_day_granularity():
+    assert len(plan_shards(date(2024, 1, 1), date(2024, 1, 31), granularity="day")) == 31
+
+
+def test_end_before_start():
+    with pytest.raises(ValueError):
+        plan_shards(date(2024, 2, 1), date(2024, 1, 1))
+
+
+def test_split_shard():
+    days = split_shard(Shard(2024, 2, 0))
+    assert days[0] == Shard(2024, 2, 1) and days[-1] == Shard(2024, 2, 29) and len(days) == 29
+    assert split_shard(Shard(2024, 2, 3)) == []
+
+
+def test_labels_and_fields():
+    assert Shard(2024, 3, 0).label == "2024-03"
+    assert Shard(2024, 3, 7).label == "2024-03-07"
+    fields = shard_fields(Shard(2024, 3, 7), [("frmPrincipal:ano", "2023"), ("frmPrincipal:cmbTipo", "1")])
+    assert fields == [("frmPrincipal:cmbTipo", "1"), ("frmPrincipal:ano", "2024"),
+                      ("frmPrincipal:mes", "3"), ("frmPrincipal:dia", "7")]
@@ -0,0 +1,40 @@
+from sri_report import iter_report, realign
+
+HEADER = ["COMPROBANTE", "SERIE_COMPROBANTE", "RUC_EMISOR", "RAZON_SOCIAL_EMISOR", "FECHA_EMISION",
+          "CLAVE_ACCESO", "NUMERO_AUTORIZACION", "IMPORTE_TOTAL"]
+CLAVE = "1" * 49
+
+
+def test_realign_joins_the_razon_social_back():
+    values = ["Factura", "001-001-000000001", "1790000000001", "ACME", "S.A.", "01/02/2024", CLAVE, CLAVE, "10.00"]
+    assert realign(HEADER, values) == ["Factura", "001-001-000000001", "1790000000001", "ACME S.A.",
+                                       "01/02/2024", CLAVE, CLAVE, "10.00"]
+
+
+def test_realign_gives_up_when_it_cannot_place_the_line():
+    # No access key after its column
+    assert realign(HEADER, ["Factura", "x", "y", "ACME", "01/02/2024", "no key", "", ""]) is None
+    # Nothing shifted
+    assert realign(HEADER, ["Factura", "x", "y", "ACME", "01/02/2024", CLAVE, CLAVE, "1"]) is None
+    # No razón social column to put the extra pieces in
+    header = [column for column in HEADER if column != "RAZON_SOCIAL_EMISOR"]
+    assert realign(header, ["Factura", "x", "y", "z", "01/02/2024", CLAVE, CLAVE, "1"]) is None
+
+
+def test_iter_report_reads_shifted_and_broken_lines(tmp_path):
+    lines = [
+        "\t".join(HEADER),
+        "\t".join(["Factura", "001-001-000000001", "1790000000001", "ACME", "01/02/2024", CLAVE, CLAVE, "10.00"]),
+        "\t".join(["Factura", "001-001-000000002", "1790000000001", "ACME", "S.A.", "01/02/2024",
+                   "2" * 49, "2" * 49, "5.00"]),
+        "garbage before " + "3" * 49,
+        "no key at all",
+    ]
+    path = tmp_path / "reporte.txt"
+    path.write_text("\r\n".join(lines), encoding="latin-1")
+
+    records = list(iter_report(path))
+    assert [record["clave_acceso"] for record in records] == [CLAVE, "2" * 49, "3" * 49]
+    assert records[0]["factura"] == "Factura 001-001-000000001"
+    assert records[1]["emisor"] == "ACME S.A."
+    assert records[2]["factura"] == "" and records[2]["emisor"] == ""
@@ -0,0 +1,61 @@
+import pytest
+
+from mock_portal import MockPortal
+from sri_soap import AutorizacionClient
+
+
+@pytest.fixture
+def client(portal):
+    client = AutorizacionClient(portal.soap_url, concurrency=2, retries=0)
+    yield client
+    client.close()
+
+
+def test_fetch_returns_the_authorized_xml(portal, client):
+    document = portal.documents[5]
+    data = client.fetch(document.clave_acceso)
+    assert data.startswith(b'<?xml version="1.0" encoding="UTF-8"?>\n<autorizacion>')
+    assert b"<estado>AUTORIZADO</estado>" in data
+    assert document.clave_acceso.encode() in data
+
+
+def test_unknown_key_raises(client):
+    with pytest.raises(RuntimeError, match="No autorización found"):
+        client.fetch("1" * 49)
+
+
+def test_server_fault_raises():
+    portal = MockPortal(documents=1, latency=0, error_rate=1, seed=1).start()
+    client = AutorizacionClient(portal.soap_url, retries=0)
+    try:
+        with pytest.raises(RuntimeError, match="HTTP 500"):
+            client.fetch(portal.documents[0].clave_acceso)
+    finally:
+        client.close()
+        portal.stop()
+
+
+def test_fetch_many_keeps_a_bounded_window(portal, client):
+    consumed = []
+
+    def keys():
+        for document in portal.documents:
+            consumed.append(document.clave_acceso)
+            yield document.clave_acceso
+
+    results = client.fetch_many(keys())
+    first = next(results)
+    # Only a window of twice the concurrency is read from the iterable before results come back
+    assert len(consumed) <= client.concurrency * 2
+
+    outcomes = [first, *results]
+    assert len(outcomes) == len(portal.documents)
+    assert all(error is None and seconds >= 0 for _, _, error, seconds in outcomes)
+    assert {key for key, _, _, _ in outcomes} == set(portal.by_clave)
+
+
+def test_fetch_many_reports_errors_per_item(portal, client):
+    good = portal.documents[0].clave_acceso
+    outcomes = {key: (data, error) for key, data, error, _ in client.fetch_many([good, "2" * 49])}
+    assert outcomes[good][1] is None and outcomes[good][0]
+    assert isinstance(outcomes["2" * 49][1], RuntimeError)
@@ -0,0 +1,157 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from queue import Empty, Queue
+
+# Politeness ceiling: never point more browsers than this at the SRI portal at once
+MAX_WORKERS = 4
+# Tries per date shard before it is given up and reported as missing
+SHARD_ATTEMPTS = 3
+
+
+class ShardAttempts:
+    """Failures per shard, shared by the workers of run_shards()"""
+
+    def __init__(self, limit):
+        self.lock = threading.Lock()
+        self.limit = max(1, limit)
+        self.failures = {}
+        self.missing = []  # labels of the shards given up on
+
+    def record_failure(self, shard):
+        """Count a failed try; returns False once the shard is out of attempts"""
+        with self.lock:
+            self.failures[shard] = self.failures.get(shard, 0) + 1
+            if self.failures[shard] < self.limit:
+                return True
+            self.missing.append(shard.label)
+            return False
+
+
+class WorkerPool:
+    """Share one manual login between several browsers, each downloading its own pages.
+
+    The leader (the browser the user logged into) exports its cookies, sessionStorage
+    and search form; every other worker is a headless Chrome that imports them and
+    reruns the same search before jumping to its pages.
+    """
+
+    def __init__(self, leader, workers, max_workers=MAX_WORKERS, headless=True):
+        if workers > max_workers:
+            print(f"⚠️ Limiting to {max_workers} workers to stay polite with the SRI portal")
+        self.leader = leader
+        self.size = max(1, min(workers, max_workers))
+        self.headless = headless
+        self.missing_shards = []  # labels of the shards run_shards() could not download
+
+    def assign_pages(self, pages):
+        """Deal the pages round-robin, so every worker owns a disjoint share"""
+        return [pages[worker_id::self.size] for worker_id in range(self.size)]
+
+    def run(self, pages=None):
+        """Download the given pages (default: every page of the listing); returns the number of pages"""
+        if pages is None:
+            total_pages = self.leader.page_count()
+            if not total_pages:
+                print("⚠️ Could not read the number of pages, downloading with a single browser")
+                return self.leader.walk_pages()
+            pages = list(range(1, total_pages + 1))
+
+        session = self.leader.export_session()
+        assignments = self.assign_pages(pages)
+        print(f"👥 {self.size} workers sharing {len(pages)} pages")
+
+        jobs = {worker_id: (self._work_pages, pages) for worker_id, pages in enumerate(assignments) if pages}
+        for worker_id, done in self._run_workers(jobs, session).items():
+            print(f"✅ Worker {worker_id} finished {done}/{len(assignments[worker_id])} pages")
+        return len(pages)
+
+    def run_shards(self, shards, max_shard_rows=None, attempts=SHARD_ATTEMPTS):
+        """Search and download every date shard, splitting the ones that come back too large.
+
+        A failed shard goes back to the queue, up to `attempts` tries; the ones still not
+        downloaded at the end are left in missing_shards. Returns the number of shards downloaded.
+        """
+        session = self.leader.export_session()
+        shard_queue = Queue()
+        for shard in shards:
+            shard_queue.put(shard)
+        print(f"👥 {self.size} workers sharing {len(shards)} shards")
+
+        # Every worker fills in the leader's search criteria, only the dates change per shard
+        tries = ShardAttempts(attempts)
+        argument = (shard_queue, max_shard_rows, session["fields"], tries)
+        jobs = {worker_id: (self._work_shards, argument) for worker_id in range(self.size)}
+        done = self._run_workers(jobs, session, search=False)
+        for worker_id, count in done.items():
+            print(f"✅ Worker {worker_id} finished {count} shards")
+
+        # Shards no worker got to, because every worker died
+        while True:
+            try:
+                tries.missing.append(shard_queue.get_nowait().label)
+            except Empty:
+                break
+        self.missing_shards = sorted(tries.missing)
+        if self.missing_shards:
+            print(f"⚠️ {len(self.missing_shards)} shards not downloaded: {', '.join(self.missing_shards)}")
+        return sum(done.values())
+
+    def _run_workers(self, jobs, session, search=True):
+        """Run one job per worker in parallel; returns {worker_id: result} for those that succeeded"""
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="sri-worker") as executor:
+            futures = {
+                executor.submit(self._start_worker, worker_id, session, search, job, argument): worker_id
+                for worker_id, (job, argument) in jobs.items()
+            }
+            for future in as_completed(futures):
+                worker_id = futures[future]
+                try:
+                    results[worker_id] = future.result()
+                except Exception as e:
+                    print(f"❌ Worker {worker_id} failed: {e}")
+        return results
+
+    def _start_worker(self, worker_id, session, search, job, argument):
+        if worker_id == 0:
+            # The leader already shows the listing, it takes the first share itself
+            return job(self.leader, argument)
+
+        worker = self.leader.spawn_worker(worker_id)
+        try:
+            worker.setup_driver(headless=self.headless)
+            worker.import_session(session, search=search)
+            worker.prepare_downloads()
+            return job(worker, argument)
+        finally:
+            worker.close()
+
+    @staticmethod
+    def _work_pages(worker, pages):
+        return worker.download_pages(pages)
+
+    @staticmethod
+    def _work_shards(worker, argument):
+        shard_queue, max_shard_rows, base_fields, tries = argument
+        done = 0
+        while True:
+            try:
+                shard = shard_queue.get(timeout=1)
+            except Empty:
+                # Another worker may still split a shard into new ones
+                if shard_queue.unfinished_tasks == 0:
+                    return done
+                continue
+            try:
+                for child in worker.download_shard(shard, base_fields, max_shard_rows):
+                    shard_queue.put(child)
+                done += 1
+            except Exception as e:
+                if tries.record_failure(shard):
+                    print(f"❌ Shard {shard.label} failed, queuing it again: {e}")
+                    # Put back before task_done, so the other workers never see an empty queue and leave
+                    shard_queue.put(shard)
+                else:
+                    print(f"❌ Shard {shard.label} failed {tries.limit} times, giving up: {e}")
+            finally:
+                shard_queue.task_done()